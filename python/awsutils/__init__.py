@@ -1 +1,108 @@
-from . import *
+"""awsutils loads its modules, and with them boto3, on first use: `import awsutils` imports nothing else, and
+`awsutils.S3Object` or `from awsutils import S3Object` imports only the modules S3Object needs."""
+import importlib
+
+_SUBMODULES = frozenset([
+    'aio',
+    'batching',
+    'connection_pool',
+    'instrumentation',
+    'retry',
+    's3_bucket',
+    's3_cache',
+    's3_compression',
+    's3_event',
+    's3_object',
+    's3_record',
+    's3_select',
+    's3_transfer',
+    's3_url',
+    'session',
+    'sns_topic',
+    'sqs_consumer',
+    'sqs_queue',
+])
+
+_EXPORTS = {
+    'AsyncSession': 'aio',
+    'AsyncS3Object': 'aio',
+    'AsyncSnsTopic': 'aio',
+    'AsyncSqsQueue': 'aio',
+    'new_async_s3_object': 'aio',
+    'new_async_session': 'aio',
+    'new_async_sns_topic': 'aio',
+    'new_async_sqs_queue': 'aio',
+    'BatchStats': 'batching',
+    'BufferedBatcher': 'batching',
+    'PoolStats': 'connection_pool',
+    'CallRecord': 'instrumentation',
+    'Instrumentation': 'instrumentation',
+    'MetricsAggregator': 'instrumentation',
+    'CircuitOpenError': 'retry',
+    'RetryConfig': 'retry',
+    'RetryStats': 'retry',
+    'S3Bucket': 's3_bucket',
+    'SyncReport': 's3_bucket',
+    'create_s3_bucket': 's3_bucket',
+    'get_bucket_region': 's3_bucket',
+    'new_s3_bucket': 's3_bucket',
+    'CacheStats': 's3_cache',
+    'S3Cache': 's3_cache',
+    'new_s3_cache': 's3_cache',
+    'content_encoding_for': 's3_compression',
+    'iter_compress': 's3_compression',
+    'iter_decompress': 's3_compression',
+    'S3EventDeduplicator': 's3_event',
+    'S3EventRecord': 's3_event',
+    'S3EventStats': 's3_event',
+    'compare_sequencers': 's3_event',
+    'parse_s3_event': 's3_event',
+    'S3Object': 's3_object',
+    'new_s3_object': 's3_object',
+    'new_s3_object_from_listing': 's3_object',
+    'new_s3_object_from_s3_event_bytes': 's3_object',
+    'new_s3_object_from_s3_event_record': 's3_object',
+    'new_s3_object_from_s3_url': 's3_object',
+    'new_s3_objects': 's3_object',
+    'new_s3_objects_from_s3_event': 's3_object',
+    'S3ObjectBatch': 's3_record',
+    'S3ObjectRecord': 's3_record',
+    'iter_csv_records': 's3_select',
+    'iter_json_lines': 's3_select',
+    'iter_lines': 's3_select',
+    'select_expression': 's3_select',
+    'TransferConfig': 's3_transfer',
+    'split_s3_url': 's3_url',
+    'ClientCacheStats': 'session',
+    'Session': 'session',
+    'new_session_for_region': 'session',
+    'new_session_from_config': 'session',
+    'SnsTopic': 'sns_topic',
+    'create_sns_topic': 'sns_topic',
+    'new_sns_topic': 'sns_topic',
+    'ConsumerStats': 'sqs_consumer',
+    'SqsConsumer': 'sqs_consumer',
+    'SqsQueue': 'sqs_queue',
+    'create_sqs_queue': 'sqs_queue',
+    'new_sqs_queue': 'sqs_queue',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+# https://peps.python.org/pep-0562/
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+        # cached, so later lookups no longer reach __getattr__
+        globals()[name] = value
+        return value
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | _SUBMODULES | set(_EXPORTS))
@@ -0,0 +1,160 @@
+import asyncio
+import concurrent.futures
+import dataclasses
+import functools
+from typing import Callable
+
+from .s3_object import S3Object, new_s3_object
+from .s3_transfer import TransferConfig
+from .session import Session
+from .sns_topic import SnsTopic, new_sns_topic
+from .sqs_queue import SqsQueue, new_sqs_queue
+
+
+@dataclasses.dataclass
+class AsyncSession:
+    """AsyncSession class
+
+    boto3 only offers blocking calls, so the coroutines of AsyncS3Object, AsyncSqsQueue and AsyncSnsTopic run the
+    matching blocking method on the executor of their AsyncSession. The executor is shared by every wrapper built
+    from the same AsyncSession, as are the Session's cached clients and connection pools, so any number of
+    coroutines can await calls while at most max_workers of them hold a thread and a connection at a time.
+
+    The Session is borrowed: closing an AsyncSession shuts down its executor, and leaves the Session and its clients
+    open for the caller.
+    """
+    session: Session = None
+    executor: concurrent.futures.ThreadPoolExecutor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        # close waits for the calls in flight, which must not block the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.close)
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run the blocking fn on the executor and return its result."""
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+        return None
+
+
+@dataclasses.dataclass
+class AsyncS3Object:
+    """AsyncS3Object class"""
+    async_session: AsyncSession = None
+    s3_object: S3Object = None
+
+    async def exists(self) -> bool:
+        return await self.async_session.run(self.s3_object.exists)
+
+    async def copy(self, target, acl: str = '') -> None:
+        return await self.async_session.run(self.s3_object.copy, target, acl)
+
+    async def download_bytes(self) -> bytes:
+        return await self.async_session.run(self.s3_object.download_bytes)
+
+    async def download_into(self, buffer, config: TransferConfig = None) -> int:
+        return await self.async_session.run(self.s3_object.download_into, buffer, config)
+
+    async def download_to_file(self, path: str, config: TransferConfig = None) -> int:
+        return await self.async_session.run(self.s3_object.download_to_file, path, config)
+
+    async def upload_bytes(self, b: bytes) -> None:
+        return await self.async_session.run(self.s3_object.upload_bytes, b)
+
+    async def upload_stream(self, source, config: TransferConfig = None) -> None:
+        return await self.async_session.run(self.s3_object.upload_stream, source, config)
+
+
+@dataclasses.dataclass
+class AsyncSqsQueue:
+    """AsyncSqsQueue class"""
+    async_session: AsyncSession = None
+    sqs_queue: SqsQueue = None
+
+    async def exists(self) -> bool:
+        return await self.async_session.run(self.sqs_queue.exists)
+
+    async def message_count(self) -> int:
+        return await self.async_session.run(self.sqs_queue.message_count)
+
+    async def send_message(self, message: str) -> None:
+        return await self.async_session.run(self.sqs_queue.send_message, message)
+
+    async def send_messages(self, messages: list, max_attempts: int = 3) -> list:
+        return await self.async_session.run(self.sqs_queue.send_messages, messages, max_attempts)
+
+    async def receive_messages(self, max_messages: int, wait_time_seconds: int = 0,
+                               visibility_timeout: int = None) -> list:
+        return await self.async_session.run(self.sqs_queue.receive_messages, max_messages, wait_time_seconds,
+                                            visibility_timeout)
+
+    async def delete_messages(self, receipt_handles: list, max_attempts: int = 3) -> list:
+        return await self.async_session.run(self.sqs_queue.delete_messages, receipt_handles, max_attempts)
+
+
+@dataclasses.dataclass
+class AsyncSnsTopic:
+    """AsyncSnsTopic class"""
+    async_session: AsyncSession = None
+    sns_topic: SnsTopic = None
+
+    async def exists(self) -> bool:
+        return await self.async_session.run(self.sns_topic.exists)
+
+    async def publish(self, subject: str, message: str) -> None:
+        return await self.async_session.run(self.sns_topic.publish, subject, message)
+
+
+def new_async_session(session: Session, max_workers: int = 32) -> AsyncSession:
+    """Wrap session with an executor of max_workers threads.
+
+    session itself is changed: its s3, sns and sqs connection pools grow to max_workers with
+    Session.reserve_pool_connections, so that connections opened by every thread are reused. Clients it cached with
+    smaller pools are closed and rebuilt, so clients obtained from it before must not be used afterwards. Pass a
+    Session of its own to keep the caller's untouched.
+    """
+    session.reserve_pool_connections(max_workers)
+
+    async_session = AsyncSession()
+    async_session.session = session
+    async_session.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                                   thread_name_prefix='awsutils-aio')
+
+    return async_session
+
+
+async def new_async_s3_object(async_session: AsyncSession, bucket: str, object_key: str,
+                              lazy: bool = False) -> AsyncS3Object:
+    try:
+        s3_object = await async_session.run(new_s3_object, async_session.session, bucket, object_key, lazy)
+    except Exception as e:
+        raise e
+
+    return AsyncS3Object(async_session, s3_object)
+
+
+async def new_async_sqs_queue(async_session: AsyncSession, queue_name: str) -> AsyncSqsQueue:
+    try:
+        sqs_queue = await async_session.run(new_sqs_queue, async_session.session, queue_name)
+    except Exception as e:
+        raise e
+
+    return AsyncSqsQueue(async_session, sqs_queue)
+
+
+async def new_async_sns_topic(async_session: AsyncSession, topic_name: str) -> AsyncSnsTopic:
+    try:
+        sns_topic = await async_session.run(new_sns_topic, async_session.session, topic_name)
+    except Exception as e:
+        raise e
+
+    return AsyncSnsTopic(async_session, sns_topic)
@@ -0,0 +1,209 @@
+import dataclasses
+import threading
+import time
+from typing import Callable, Iterable, Iterator
+
+from .retry import error_code, is_retryable
+
+
+@dataclasses.dataclass
+class BatchStats:
+    """BatchStats class"""
+    entries_sent: int = 0
+    entries_failed: int = 0
+    entries_retried: int = 0
+    batches_sent: int = 0
+    bytes_sent: int = 0
+    started: float = dataclasses.field(default_factory=time.monotonic)
+
+    def entries_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started
+        if elapsed <= 0:
+            return 0.0
+
+        return self.entries_sent / elapsed
+
+    def batch_fill(self) -> float:
+        """Average number of entries per batch call."""
+        if self.batches_sent == 0:
+            return 0.0
+
+        return (self.entries_sent + self.entries_failed + self.entries_retried) / self.batches_sent
+
+
+def pack_entries(entries: Iterable[dict], entry_size: Callable[[dict], int], max_entries: int,
+                 max_bytes: int) -> Iterator[list]:
+    """Group entries into lists of at most max_entries entries and max_bytes bytes, keeping their order."""
+    batch = []
+    batch_bytes = 0
+    for entry in entries:
+        size = entry_size(entry)
+        if size > max_bytes:
+            raise ValueError(f'invalid entry: {size} bytes is over the {max_bytes} byte batch limit')
+
+        if len(batch) == max_entries or batch_bytes + size > max_bytes:
+            yield batch
+            batch = []
+            batch_bytes = 0
+
+        batch.append(entry)
+        batch_bytes += size
+
+    if batch:
+        yield batch
+
+
+def send_batch(send: Callable[[list], dict], batch: list, entry_size: Callable[[dict], int], max_attempts: int,
+               stats: BatchStats, stats_lock: threading.Lock) -> list:
+    """Send one batch with send, which takes entries carrying an Id and returns a response with a Failed list as
+    SQS SendMessageBatch and SNS PublishBatch do. Failed entries that are not the sender's fault are sent again, up
+    to max_attempts times in all. A call that fails as a whole fails every entry with the error code of its
+    exception, and is only sent again if the error is retryable (see retry.is_retryable).
+
+    Returns the entries still failing, each with the Code and Message of its last failure.
+    """
+    pending = list(batch)
+    failed = []
+    attempt = 1
+    while True:
+        entries = [dict(entry, Id=str(i)) for i, entry in enumerate(pending)]
+        try:
+            response = send(entries)
+            failures = {f['Id']: f for f in response.get('Failed', [])}
+        except Exception as e:
+            failures = {entry['Id']: {'SenderFault': not is_retryable(e), 'Code': error_code(e), 'Message': str(e)}
+                        for entry in entries}
+
+        retry = []
+        with stats_lock:
+            stats.batches_sent += 1
+            for i, entry in enumerate(pending):
+                failure = failures.get(str(i))
+                if failure is None:
+                    stats.entries_sent += 1
+                    stats.bytes_sent += entry_size(entry)
+                elif failure.get('SenderFault') or attempt >= max_attempts:
+                    stats.entries_failed += 1
+                    failed.append(dict(entry, Code=failure.get('Code', ''), Message=failure.get('Message', '')))
+                else:
+                    stats.entries_retried += 1
+                    retry.append(entry)
+
+        if not retry:
+            return failed
+
+        time.sleep(min(0.05 * 2 ** attempt, 1.0))
+        pending = retry
+        attempt += 1
+
+
+class BufferedBatcher:
+    """BufferedBatcher class
+
+    Buffers entries added from any thread and sends them in batches: a full batch is sent by the thread that fills
+    it, and a background thread sends whatever is buffered once the oldest entry has waited linger seconds. Entries
+    that still fail after max_attempts are kept in failed.
+    """
+
+    def __init__(self, send: Callable[[list], dict], entry_size: Callable[[dict], int], max_entries: int,
+                 max_bytes: int, linger: float = 0.05, max_attempts: int = 3):
+        self.send = send
+        self.entry_size = entry_size
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self.stats = BatchStats()
+        self.failed = []
+
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._first_added = 0.0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='awsutils-batcher', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, entry: dict) -> None:
+        size = self.entry_size(entry)
+        if size > self.max_bytes:
+            raise ValueError(f'invalid entry: {size} bytes is over the {self.max_bytes} byte batch limit')
+
+        batch = None
+        with self._condition:
+            if self._closed:
+                raise ValueError('invalid BufferedBatcher: closed')
+
+            if len(self._buffer) == self.max_entries or self._buffer_bytes + size > self.max_bytes:
+                batch = self._take()
+
+            if not self._buffer:
+                self._first_added = time.monotonic()
+                self._condition.notify()
+            self._buffer.append(entry)
+            self._buffer_bytes += size
+
+            if len(self._buffer) == self.max_entries and batch is None:
+                batch = self._take()
+
+        if batch:
+            self._send(batch)
+
+        return None
+
+    def flush(self) -> None:
+        with self._condition:
+            batch = self._take()
+
+        if batch:
+            self._send(batch)
+
+        return None
+
+    def close(self) -> None:
+        """Send everything still buffered and stop the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+        return self.flush()
+
+    def _take(self) -> list:
+        batch = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+
+        return batch
+
+    def _send(self, batch: list) -> None:
+        failed = send_batch(self.send, batch, self.entry_size, self.max_attempts, self.stats, self._stats_lock)
+        if failed:
+            with self._stats_lock:
+                self.failed.extend(failed)
+
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._buffer and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+                wait = self._first_added + self.linger - time.monotonic()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+
+                batch = self._take()
+
+            self._send(batch)
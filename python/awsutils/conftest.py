@@ -6,7 +6,6 @@ import pytest
 import testcontainers.localstack
 
 from .s3_bucket import create_s3_bucket
-from .s3_object import new_s3_object
 from .session import Session, new_session_from_config
 from .sns_topic import create_sns_topic
 from .sqs_queue import create_sqs_queue
@@ -69,22 +68,12 @@ def setup_localstack_s3_objects(aws_session: Session, s3_path: str) -> None:
 
             bucket = entry.name
             logging.info(f'--- Creating bucket: {bucket}')
-            _ = create_s3_bucket(aws_session, bucket)
+            s3_bucket = create_s3_bucket(aws_session, bucket)
 
-            bucket_path = f'{s3_path}/{bucket}'
-
-            for root, _, files in os.walk(bucket_path, topdown=False):
-                for filename in files:
-                    file_path = os.path.join(root, filename)
-
-                    f = open(file_path, mode="rb")
-                    b = f.read()
-
-                    object_key = file_path.replace(f'{bucket_path}/', '')
-
-                    logging.info(f'--- Creating object: {object_key}')
-                    s3_object = new_s3_object(aws_session, bucket, object_key)
-                    s3_object.upload_bytes(b)
+            sync_report = s3_bucket.sync_from_dir(f'{s3_path}/{bucket}')
+            if sync_report.errors:
+                raise RuntimeError(f'error: sync_from_dir failed: {sync_report.errors}')
+            logging.info(f'--- Created {sync_report.files_transferred} objects')
     except Exception as e:
         raise e
 
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import botocore.client
+
+# botocore's default max_pool_connections
+DEFAULT_POOL_CONNECTIONS = 10
+
+
+@dataclasses.dataclass
+class PoolStats:
+    """PoolStats class
+
+    botocore's connection pools never block: an attempt started while all max_connections pooled connections are in
+    use opens a connection of its own, which is closed afterwards instead of being pooled. Such attempts are counted
+    as saturated, and the time they take beyond an unsaturated attempt is the cost of waiting on the pool.
+    """
+    max_connections: int = DEFAULT_POOL_CONNECTIONS
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    attempts: int = 0
+    saturated_attempts: int = 0
+    send_seconds: float = 0.0
+    saturated_send_seconds: float = 0.0
+
+    def saturation(self) -> float:
+        """Fraction of attempts started with no pooled connection free."""
+        if self.attempts == 0:
+            return 0.0
+
+        return self.saturated_attempts / self.attempts
+
+    def connection_wait(self) -> float:
+        """Average seconds a saturated attempt took beyond an unsaturated one."""
+        unsaturated_attempts = self.attempts - self.saturated_attempts
+        if self.saturated_attempts == 0 or unsaturated_attempts == 0:
+            return 0.0
+
+        unsaturated_seconds = (self.send_seconds - self.saturated_send_seconds) / unsaturated_attempts
+
+        return max(self.saturated_send_seconds / self.saturated_attempts - unsaturated_seconds, 0.0)
+
+
+class PoolMonitor:
+    """PoolMonitor class
+
+    Counts the attempts in flight on the clients it is installed on, from botocore's before-send event to its
+    needs-retry event. A streamed response body, as get_object returns, keeps its connection until read, which is
+    after the attempt ends here.
+    """
+
+    def __init__(self, stats: PoolStats):
+        self.stats = stats
+
+        self._started = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self, client: botocore.client.BaseClient) -> None:
+        service_id = client.meta.service_model.service_id.hyphenize()
+        client.meta.events.register(f'before-send.{service_id}', self._before_send)
+        client.meta.events.register(f'needs-retry.{service_id}', self._needs_retry)
+
+        return None
+
+    def _before_send(self, **kwargs) -> None:
+        with self._lock:
+            saturated = self.stats.in_flight >= self.stats.max_connections
+            self.stats.in_flight += 1
+            self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.stats.in_flight)
+            self.stats.attempts += 1
+            self.stats.saturated_attempts += saturated
+
+        self._started.attempt = (time.monotonic(), saturated)
+
+        return None
+
+    def _needs_retry(self, **kwargs) -> None:
+        started, saturated = getattr(self._started, 'attempt', (0.0, False))
+        if started == 0.0:
+            return None
+        self._started.attempt = (0.0, False)
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.stats.in_flight -= 1
+            self.stats.send_seconds += elapsed
+            if saturated:
+                self.stats.saturated_send_seconds += elapsed
+
+        return None
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import math
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import botocore.client
+
+# latency buckets grow by 5%, which bounds the error of a reported percentile to 5%
+_BUCKET_GROWTH = math.log(1.05)
+_BUCKET_MIN = 1e-5
+
+
+@dataclasses.dataclass
+class CallRecord:
+    """CallRecord class"""
+    service: str = ''
+    region: str = ''
+    operation: str = ''
+    elapsed: float = 0.0
+    attempts: int = 0
+    error_code: str = ''
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+
+class Instrumentation:
+    """Instrumentation class
+
+    Receives a CallRecord after every API call made through the clients of a Session whose instrumentation it is.
+    This base class ignores them; subclass it and override record() to export them. A Session without
+    instrumentation registers no hooks at all.
+    """
+
+    def record(self, call_record: CallRecord) -> None:
+        return None
+
+
+class LatencyHistogram:
+    """LatencyHistogram class"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets = collections.Counter()
+
+    def add(self, elapsed: float) -> None:
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self._buckets[_bucket(elapsed)] += 1
+
+        return None
+
+    def percentile(self, percentile: float) -> float:
+        """Latency in seconds at percentile (0-100), as the upper bound of its bucket capped at the maximum."""
+        if self.count == 0:
+            return 0.0
+
+        rank = max(math.ceil(self.count * percentile / 100), 1)
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(_BUCKET_MIN * math.exp((bucket + 1) * _BUCKET_GROWTH), self.max)
+
+        return self.max
+
+    def mean(self) -> float:
+        if self.count == 0:
+            return 0.0
+
+        return self.total / self.count
+
+
+@dataclasses.dataclass
+class OperationMetrics:
+    """OperationMetrics class"""
+    calls: int = 0
+    retries: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    errors: collections.Counter = dataclasses.field(default_factory=collections.Counter)
+    latency: LatencyHistogram = dataclasses.field(default_factory=LatencyHistogram, repr=False)
+
+
+class MetricsAggregator(Instrumentation):
+    """MetricsAggregator class
+
+    Keeps call, retry, byte and error code counts and a latency histogram per (service, operation) in memory.
+    """
+
+    def __init__(self):
+        self.operations = collections.defaultdict(OperationMetrics)
+        self._lock = threading.Lock()
+
+    def record(self, call_record: CallRecord) -> None:
+        with self._lock:
+            metrics = self.operations[(call_record.service, call_record.operation)]
+            metrics.calls += 1
+            metrics.retries += max(call_record.attempts - 1, 0)
+            metrics.bytes_sent += call_record.bytes_sent
+            metrics.bytes_received += call_record.bytes_received
+            if call_record.error_code != '':
+                metrics.errors[call_record.error_code] += 1
+            metrics.latency.add(call_record.elapsed)
+
+        return None
+
+    def percentile(self, service: str, operation: str, percentile: float) -> float:
+        with self._lock:
+            metrics = self.operations.get((service, operation))
+            if metrics is None:
+                return 0.0
+
+            return metrics.latency.percentile(percentile)
+
+    def snapshot(self, percentiles: tuple = (50, 90, 99)) -> list:
+        """Return a dict per (service, operation), sorted by service and operation, with its counts, error codes and
+        latency mean, maximum and percentiles in seconds (p50, p90, ... keys)."""
+        with self._lock:
+            rows = []
+            for (service, operation), metrics in sorted(self.operations.items()):
+                row = {
+                    'service': service,
+                    'operation': operation,
+                    'calls': metrics.calls,
+                    'retries': metrics.retries,
+                    'bytes_sent': metrics.bytes_sent,
+                    'bytes_received': metrics.bytes_received,
+                    'errors': dict(metrics.errors),
+                    'mean': metrics.latency.mean(),
+                    'max': metrics.latency.max,
+                }
+                for percentile in percentiles:
+                    row[f'p{percentile:g}'] = metrics.latency.percentile(percentile)
+                rows.append(row)
+
+        return rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self.operations.clear()
+
+        return None
+
+
+class CallTracer:
+    """CallTracer class
+
+    Times the calls of the client it is installed on from botocore's before-call event to its after-call or
+    after-call-error event, counting attempts and request body bytes in between, and passes a CallRecord per call
+    to instrumentation.
+    """
+
+    def __init__(self, instrumentation: Instrumentation, service: str, region: str):
+        self.instrumentation = instrumentation
+        self.service = service
+        self.region = region or ''
+
+        self._call = threading.local()
+
+    def install(self, client: botocore.client.BaseClient) -> None:
+        service_id = client.meta.service_model.service_id.hyphenize()
+        client.meta.events.register(f'before-call.{service_id}', self._before_call)
+        client.meta.events.register(f'before-send.{service_id}', self._before_send)
+        client.meta.events.register(f'after-call.{service_id}', self._after_call)
+        client.meta.events.register(f'after-call-error.{service_id}', self._after_call_error)
+
+        return None
+
+    def _before_call(self, model=None, **kwargs) -> None:
+        # a call runs on a single thread, from before-call to after-call
+        self._call.record = CallRecord(self.service, self.region, model.name)
+        self._call.started = time.perf_counter()
+
+        return None
+
+    def _before_send(self, request=None, **kwargs) -> None:
+        call_record = getattr(self._call, 'record', None)
+        if call_record is None:
+            return None
+
+        call_record.attempts += 1
+        call_record.bytes_sent += int(request.headers.get('Content-Length', 0))
+
+        return None
+
+    def _after_call(self, http_response=None, parsed=None, model=None, **kwargs) -> None:
+        call_record = self._end_call()
+        if call_record is None:
+            return None
+
+        if http_response.status_code >= 300:
+            call_record.error_code = parsed.get('Error', {}).get('Code', str(http_response.status_code))
+        if model.http.get('method') != 'HEAD':
+            call_record.bytes_received = int(http_response.headers.get('Content-Length', 0))
+        self.instrumentation.record(call_record)
+
+        return None
+
+    def _after_call_error(self, exception=None, **kwargs) -> None:
+        call_record = self._end_call()
+        if call_record is None:
+            return None
+
+        call_record.error_code = type(exception).__name__
+        self.instrumentation.record(call_record)
+
+        return None
+
+    def _end_call(self) -> CallRecord:
+        call_record = getattr(self._call, 'record', None)
+        if call_record is None:
+            return None
+
+        call_record.elapsed = time.perf_counter() - self._call.started
+        self._call.record = None
+
+        return call_record
+
+
+def _bucket(elapsed: float) -> int:
+    if elapsed <= _BUCKET_MIN:
+        return 0
+
+    return int(math.log(elapsed / _BUCKET_MIN) / _BUCKET_GROWTH)
@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import dataclasses
+import random
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import botocore.exceptions
+
+if TYPE_CHECKING:
+    import botocore.client
+
+# https://docs.aws.amazon.com/sdkref/latest/guide/feature-retry-behavior.html
+THROTTLING_ERROR_CODES = frozenset([
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'TransactionInProgressException',
+    'RequestLimitExceeded',
+    'BandwidthLimitExceeded',
+    'LimitExceededException',
+    'RequestThrottled',
+    'SlowDown',
+    'PriorRequestNotComplete',
+    'EC2ThrottledException',
+])
+TRANSIENT_ERROR_CODES = frozenset([
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'InternalError',
+    'InternalFailure',
+    'ServiceUnavailable',
+])
+TRANSIENT_STATUS_CODES = frozenset([500, 502, 503, 504])
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+@dataclasses.dataclass
+class RetryConfig:
+    """RetryConfig class
+
+    max_attempts counts the first attempt. Retries wait a random time of up to base_delay doubled for each attempt
+    and capped at max_delay. After a throttle, requests to the service are rate limited to beta times the measured
+    request rate, no lower than min_rate per second, and the limit grows back by recovery times that rate per second
+    without throttles. failure_threshold consecutive transient failures open the circuit breaker of the service for
+    cooldown seconds.
+    """
+    max_attempts: int = 5
+    base_delay: float = 0.05
+    max_delay: float = 20.0
+    min_rate: float = 1.0
+    beta: float = 0.7
+    recovery: float = 0.2
+    failure_threshold: int = 10
+    cooldown: float = 30.0
+
+
+@dataclasses.dataclass
+class RetryStats:
+    """RetryStats class"""
+    calls: int = 0
+    attempts: int = 0
+    retries: int = 0
+    throttles: int = 0
+    transient_errors: int = 0
+    circuit_opens: int = 0
+    calls_rejected: int = 0
+    backoff_seconds: float = 0.0
+    rate_limited_seconds: float = 0.0
+
+
+class TokenBucket:
+    """TokenBucket class
+
+    Does not limit requests until the first throttle. From then on, requests take a token each from a bucket
+    refilled at rate tokens per second, waiting for one when the bucket is empty.
+    """
+
+    def __init__(self, min_rate: float = 1.0, beta: float = 0.7, recovery: float = 0.2):
+        self.min_rate = min_rate
+        self.beta = beta
+        self.recovery = recovery
+        self.rate = 0.0
+
+        self._tokens = 0.0
+        self._refilled = 0.0
+        self._throttled_rate = 0.0
+        self._throttled = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._measured_rate = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, and return the seconds waited for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._measure(now)
+            if self.rate <= 0:
+                return 0.0
+
+            self._refill(now)
+            # tokens go negative so that concurrent callers queue up behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            measured_rate = self._measured_rate
+            if measured_rate <= 0:
+                # no full window yet, so spread what was sent over at least one
+                measured_rate = self._window_count / max(now - self._window_start, 0.5)
+            if self.rate > 0:
+                measured_rate = min(measured_rate, self.rate)
+
+            self._throttled_rate = max(self.min_rate, measured_rate * self.beta)
+            self._throttled = now
+            self.rate = self._throttled_rate
+            self._tokens = min(self._tokens, 0.0)
+
+        return None
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.rate <= 0:
+                return None
+
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = self._throttled_rate * (1 + self.recovery * (now - self._throttled))
+
+        return None
+
+    def _refill(self, now: float) -> None:
+        if self._refilled > 0:
+            self._tokens = min(self._tokens + (now - self._refilled) * self.rate, max(self.rate, 1.0))
+        self._refilled = now
+
+    def _measure(self, now: float) -> None:
+        self._window_count += 1
+        elapsed = now - self._window_start
+        if elapsed >= 0.5:
+            self._measured_rate = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+
+
+class CircuitBreaker:
+    """CircuitBreaker class
+
+    Opens after failure_threshold consecutive failures and rejects calls for cooldown seconds. It then lets a single
+    trial call through, which closes it on success and opens it again on failure. A trial that never reports either,
+    such as a call that fails before it is sent, ends after another cooldown and the next call becomes the trial.
+    """
+
+    def __init__(self, failure_threshold: int = 10, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._failures = 0
+        self._opened = None
+        self._trial = None
+        self._lock = threading.Lock()
+
+    def state(self) -> str:
+        with self._lock:
+            if self._opened is None:
+                return 'closed'
+            if self._trial is not None or time.monotonic() - self._opened >= self.cooldown:
+                return 'half-open'
+
+            return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened < self.cooldown:
+                return False
+            if self._trial is not None and now - self._trial < self.cooldown:
+                return False
+
+            self._trial = now
+
+            return True
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened is not None
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened = None
+            self._trial = None
+
+        return None
+
+    def on_failure(self) -> bool:
+        """Record a failure, and return whether it opened the breaker."""
+        with self._lock:
+            self._failures += 1
+            if self._trial is not None or (self._opened is None and self._failures >= self.failure_threshold):
+                self._opened = time.monotonic()
+                self._trial = None
+                return True
+
+        return False
+
+
+class RetryHandler:
+    """RetryHandler class
+
+    Retries, rate limits and guards the calls of the clients it is installed on, through botocore's before-call,
+    before-send and needs-retry events. A Session installs one RetryHandler per service and region on the clients
+    it builds, so every S3Bucket, S3Object, SqsQueue and SnsTopic call goes through it.
+    """
+
+    def __init__(self, config: RetryConfig, stats: RetryStats, stats_lock: threading.Lock):
+        self.config = config
+        self.stats = stats
+        self.token_bucket = TokenBucket(config.min_rate, config.beta, config.recovery)
+        self.circuit_breaker = CircuitBreaker(config.failure_threshold, config.cooldown)
+
+        self._stats_lock = stats_lock
+
+    def install(self, client: botocore.client.BaseClient) -> None:
+        service_id = client.meta.service_model.service_id.hyphenize()
+        client.meta.events.register(f'before-call.{service_id}', self._before_call)
+        client.meta.events.register(f'before-send.{service_id}', self._before_send)
+        client.meta.events.register(f'needs-retry.{service_id}', self._needs_retry)
+
+        return None
+
+    def _before_call(self, model=None, **kwargs) -> None:
+        if not self.circuit_breaker.allow():
+            with self._stats_lock:
+                self.stats.calls_rejected += 1
+            raise CircuitOpenError(f'error: circuit breaker open for {model.service_model.service_id} {model.name}')
+
+        with self._stats_lock:
+            self.stats.calls += 1
+
+        return None
+
+    def _before_send(self, **kwargs) -> None:
+        waited = self.token_bucket.acquire()
+        with self._stats_lock:
+            self.stats.attempts += 1
+            self.stats.rate_limited_seconds += waited
+
+        return None
+
+    def _needs_retry(self, response=None, attempts: int = 1, caught_exception=None, **kwargs):
+        kind = _failure_kind(response, caught_exception)
+        if kind == 'throttle':
+            # a throttle is still an answer, so it closes a half open breaker
+            self.token_bucket.on_throttle()
+            self.circuit_breaker.on_success()
+            with self._stats_lock:
+                self.stats.throttles += 1
+        elif kind == 'transient':
+            opened = self.circuit_breaker.on_failure()
+            with self._stats_lock:
+                self.stats.transient_errors += 1
+                self.stats.circuit_opens += opened
+        else:
+            if caught_exception is None:
+                self.token_bucket.on_success()
+            self.circuit_breaker.on_success()
+            return None
+
+        if attempts >= self.config.max_attempts or self.circuit_breaker.is_open():
+            return None
+
+        # full jitter: https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+        delay = random.uniform(0, min(self.config.max_delay, self.config.base_delay * 2 ** (attempts - 1)))
+        with self._stats_lock:
+            self.stats.retries += 1
+            self.stats.backoff_seconds += delay
+
+        return delay
+
+
+def error_code(e: Exception) -> str:
+    """Return the service error code of a ClientError, and the exception's type name for any other exception."""
+    if isinstance(e, botocore.exceptions.ClientError):
+        return e.response.get('Error', {}).get('Code', '') or type(e).__name__
+
+    return type(e).__name__
+
+
+def is_retryable(e: Exception) -> bool:
+    """Whether the call that raised e may succeed if made again: throttled, transient or 5xx ClientErrors, and
+    connection errors."""
+    if isinstance(e, botocore.exceptions.ClientError):
+        status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        return error_code(e) in THROTTLING_ERROR_CODES or error_code(e) in TRANSIENT_ERROR_CODES or \
+            status == 429 or status in TRANSIENT_STATUS_CODES
+
+    return isinstance(e, (botocore.exceptions.HTTPClientError, botocore.exceptions.ConnectionError))
+
+
+def _failure_kind(response, caught_exception) -> str:
+    """Return 'throttle', 'transient' or '' for an attempt's (http response, parsed) response or exception."""
+    if caught_exception is not None:
+        if isinstance(caught_exception, (botocore.exceptions.HTTPClientError, botocore.exceptions.ConnectionError)):
+            return 'transient'
+        return ''
+
+    if response is None:
+        return ''
+
+    http_response, parsed = response
+    code = parsed.get('Error', {}).get('Code', '')
+    if code in THROTTLING_ERROR_CODES or http_response.status_code == 429:
+        return 'throttle'
+    if code in TRANSIENT_ERROR_CODES or http_response.status_code in TRANSIENT_STATUS_CODES:
+        return 'transient'
+
+    return ''
@@ -1,9 +1,47 @@
+from __future__ import annotations
+
+import concurrent.futures
 import dataclasses
+import datetime
+import heapq
+import hashlib
+import itertools
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Iterable, Iterator
 
 import botocore.exceptions
 
+from .retry import error_code
+from .s3_record import S3ObjectBatch, S3ObjectRecord, new_s3_object_record_from_listing
+from .s3_transfer import MiB, TransferConfig, download_to_file, run_bounded, server_side_copy, upload_stream
 from .session import Session
 
+if TYPE_CHECKING:
+    import botocore.client
+
+# https://docs.aws.amazon.com/AmazonS3/latest/API/API_DeleteObjects.html
+MAX_DELETE_KEYS = 1000
+
+
+@dataclasses.dataclass
+class SyncReport:
+    """SyncReport class"""
+    files_transferred: int = 0
+    files_skipped: int = 0
+    bytes_transferred: int = 0
+    elapsed: float = 0.0
+    errors: list = dataclasses.field(default_factory=list)
+
+    def bytes_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+
+        return self.bytes_transferred / self.elapsed
+
 
 @dataclasses.dataclass
 class S3Bucket:
@@ -42,6 +80,393 @@ class S3Bucket:
 
         return None
 
+    def copy_prefix(self, target_bucket: str, target_prefix: str = '', prefix: str = None, acl: str = '',
+                    target_session: Session = None, max_concurrency: int = 8, config: TransferConfig = None) -> list:
+        """Copy every object under prefix (the bucket prefix by default) to target_bucket, replacing prefix with
+        target_prefix in its key, max_concurrency objects at a time. Each object is copied with S3Object.copy rules,
+        using the size and ETag from the listing, and both bucket regions are resolved once.
+
+        Returns the keys that could not be copied as dicts with Key, Code and Message.
+        """
+        if prefix is None:
+            prefix = self.prefix
+        target_session = target_session or self.session
+        config = config or TransferConfig()
+
+        try:
+            source_client = regional_s3_client(self.session, self.bucket)
+            target_client = regional_s3_client(target_session, target_bucket)
+        except Exception as e:
+            raise e
+
+        def copy(record: S3ObjectRecord) -> list:
+            target_key = target_prefix + record.object_key[len(prefix):]
+            try:
+                server_side_copy(source_client, self.bucket, record.object_key, target_client, target_bucket,
+                                 target_key, config, acl, record.size, record.etag)
+            except Exception as e:
+                return [{'Key': record.object_key, 'Code': error_code(e), 'Message': str(e)}]
+
+            return []
+
+        try:
+            errors = run_bounded(copy, ((record,) for record in self.iter_records(prefix)), max_concurrency)
+        except Exception as e:
+            raise e
+
+        return list(itertools.chain.from_iterable(errors))
+
+    def delete_objects(self, object_keys: Iterable[str], max_concurrency: int = 8) -> list:
+        """Delete object_keys with delete_objects calls of up to 1000 keys, max_concurrency calls at a time. Keys are
+        consumed lazily, so a generator of any length stays bounded in memory.
+
+        Returns the keys that could not be deleted as dicts with Key, Code and Message; a call that fails as a whole
+        reports every key of its batch.
+        """
+        s3_client = self.session.s3_client()
+
+        def delete_batch(object_keys: list) -> list:
+            try:
+                # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/delete_objects.html
+                response = s3_client.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={
+                        'Objects': [{'Key': object_key} for object_key in object_keys],
+                        'Quiet': True,
+                    },
+                )
+            except Exception as e:
+                return [{'Key': object_key, 'Code': error_code(e), 'Message': str(e)} for object_key in object_keys]
+
+            return [{'Key': error['Key'], 'Code': error.get('Code', ''), 'Message': error.get('Message', '')}
+                    for error in response.get('Errors', [])]
+
+        object_keys = iter(object_keys)
+        batches = iter(lambda: list(itertools.islice(object_keys, MAX_DELETE_KEYS)), [])
+
+        try:
+            errors = run_bounded(delete_batch, ((batch,) for batch in batches), max_concurrency)
+        except Exception as e:
+            raise e
+
+        return list(itertools.chain.from_iterable(errors))
+
+    def delete_prefix(self, prefix: str = None, max_concurrency: int = 8) -> list:
+        """Delete every object under prefix (the bucket prefix by default) while listing it, and return the keys that
+        could not be deleted as delete_objects does."""
+        if prefix is None:
+            prefix = self.prefix
+
+        try:
+            errors = self.delete_objects((record.object_key for record in self.iter_records(prefix)), max_concurrency)
+        except Exception as e:
+            raise e
+
+        return errors
+
+    def empty_and_delete(self, max_concurrency: int = 8) -> list:
+        """Delete every object of the bucket, then the bucket itself when all objects were deleted. Returns the keys
+        that could not be deleted, in which case the bucket is kept. Only current object versions are deleted, so a
+        versioned bucket is left non-empty.
+        """
+        try:
+            errors = self.delete_prefix('', max_concurrency)
+            if not errors:
+                self.delete()
+        except Exception as e:
+            raise e
+
+        return errors
+
+    def iter_objects(self, prefix: str = None, delimiter: str = '', start_after: str = '',
+                     modified_after: datetime.datetime = None, modified_before: datetime.datetime = None,
+                     page_size: int = 1000) -> Iterator:
+        """Lazily yield an S3Object for every key under prefix (the bucket prefix by default), one
+        list_objects_v2 page at a time, built from the listing entries without any head_object call.
+
+        S3 cannot filter listings by time, so modified_after (inclusive) and modified_before (exclusive) are applied
+        to each page as it arrives.
+        """
+        # s3_object imports this module for get_bucket_region
+        from .s3_object import new_s3_object_from_listing
+
+        for entry in self._iter_entries(prefix, delimiter, start_after, modified_after, modified_before, page_size):
+            yield new_s3_object_from_listing(self.session, self.bucket, entry, self.region)
+
+    def iter_records(self, prefix: str = None, delimiter: str = '', start_after: str = '',
+                     modified_after: datetime.datetime = None, modified_before: datetime.datetime = None,
+                     page_size: int = 1000) -> Iterator[S3ObjectRecord]:
+        """Like iter_objects, but yield immutable S3ObjectRecords, which take a fraction of the memory of an
+        S3Object."""
+        for entry in self._iter_entries(prefix, delimiter, start_after, modified_after, modified_before, page_size):
+            yield new_s3_object_record_from_listing(self.bucket, entry)
+
+    def list_batch(self, prefix: str = None, delimiter: str = '', start_after: str = '',
+                   modified_after: datetime.datetime = None, modified_before: datetime.datetime = None,
+                   page_size: int = 1000) -> S3ObjectBatch:
+        """List every key under prefix as iter_objects does into a columnar S3ObjectBatch, the most compact way to
+        hold millions of listing entries."""
+        s3_object_batch = S3ObjectBatch(self.bucket)
+        s3_object_batch.append_entries(self._iter_entries(prefix, delimiter, start_after, modified_after,
+                                                          modified_before, page_size))
+
+        return s3_object_batch
+
+    def _iter_entries(self, prefix: str, delimiter: str, start_after: str, modified_after: datetime.datetime,
+                      modified_before: datetime.datetime, page_size: int) -> Iterator[dict]:
+        if prefix is None:
+            prefix = self.prefix
+
+        try:
+            s3_client = self.session.s3_client()
+
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/paginator/ListObjectsV2.html
+            pages = s3_client.get_paginator('list_objects_v2').paginate(
+                Bucket=self.bucket,
+                Prefix=prefix,
+                Delimiter=delimiter,
+                StartAfter=start_after,
+                PaginationConfig={'PageSize': page_size},
+            )
+
+            for page in pages:
+                for entry in page.get('Contents', []):
+                    if modified_after is not None and entry['LastModified'] < modified_after:
+                        continue
+                    if modified_before is not None and entry['LastModified'] >= modified_before:
+                        continue
+
+                    yield entry
+        except Exception as e:
+            raise e
+
+    def iter_common_prefixes(self, prefix: str = None, delimiter: str = '/') -> Iterator[str]:
+        """Lazily yield the common prefixes one delimiter level below prefix (the bucket prefix by default)."""
+        if prefix is None:
+            prefix = self.prefix
+
+        try:
+            s3_client = self.session.s3_client()
+
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/paginator/ListObjectsV2.html
+            pages = s3_client.get_paginator('list_objects_v2').paginate(
+                Bucket=self.bucket,
+                Prefix=prefix,
+                Delimiter=delimiter,
+            )
+
+            for page in pages:
+                for common_prefix in page.get('CommonPrefixes', []):
+                    yield common_prefix['Prefix']
+        except Exception as e:
+            raise e
+
+    def iter_objects_sharded(self, prefix: str = None, delimiter: str = '/', max_concurrency: int = 8,
+                             ordered: bool = False, modified_after: datetime.datetime = None,
+                             modified_before: datetime.datetime = None, page_size: int = 1000) -> Iterator:
+        """Like iter_objects, but list every common prefix one delimiter level below prefix as its own shard, with up
+        to max_concurrency shards listed at once.
+
+        Objects sitting directly at the prefix level form one more shard. With ordered, objects are yielded in key
+        order as a single listing would yield them; otherwise in whatever order the shards produce them. Each shard
+        buffers at most page_size objects ahead of the consumer.
+        """
+        if prefix is None:
+            prefix = self.prefix
+
+        shards = [(prefix, delimiter)]
+        try:
+            shards += [(common_prefix, '') for common_prefix in self.iter_common_prefixes(prefix, delimiter)]
+        except Exception as e:
+            raise e
+
+        done = object()
+        stop = threading.Event()
+
+        def put(q: queue.Queue, item) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def list_shard(q: queue.Queue, shard_prefix: str, shard_delimiter: str) -> None:
+            if stop.is_set():
+                return
+            try:
+                for s3_object in self.iter_objects(shard_prefix, shard_delimiter, modified_after=modified_after,
+                                                   modified_before=modified_before, page_size=page_size):
+                    if not put(q, s3_object):
+                        return
+            except Exception as e:
+                put(q, e)
+            put(q, done)
+
+        def drain(q: queue.Queue, shard_count: int) -> Iterator:
+            while shard_count > 0:
+                item = q.get()
+                if item is done:
+                    shard_count -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+
+        # when ordered, the objects at the prefix level are merged with every other shard, so that shard holds a
+        # worker for the whole listing
+        max_workers = max_concurrency + 1 if ordered else max_concurrency
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            if ordered:
+                # the pool starts shards in submission order, so the shard being drained always has a worker
+                queues = [queue.Queue(maxsize=page_size) for _ in shards]
+                for q, shard in zip(queues, shards):
+                    executor.submit(list_shard, q, *shard)
+
+                yield from heapq.merge(
+                    drain(queues[0], 1),
+                    itertools.chain.from_iterable(drain(q, 1) for q in queues[1:]),
+                    key=lambda s3_object: s3_object.object_key,
+                )
+            else:
+                q = queue.Queue(maxsize=page_size)
+                for shard in shards:
+                    executor.submit(list_shard, q, *shard)
+
+                yield from drain(q, len(shards))
+        finally:
+            # a consumer that stops early leaves the shards not started yet unlisted
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def sync_from_dir(self, directory: str, prefix: str = None, checksum: bool = False, max_concurrency: int = 8,
+                      config: TransferConfig = None) -> SyncReport:
+        """Upload every file under directory to prefix (the bucket prefix by default) joined with its relative path,
+        max_concurrency files at a time, streaming each with S3Object.upload_stream rules.
+
+        A file is skipped when an object of the same size exists and was modified no earlier than the file. With
+        checksum, a file whose single part ETag matches its MD5 is skipped as well. Failed files are reported as
+        dicts with Key, Code and Message in the returned SyncReport.errors.
+        """
+        if prefix is None:
+            prefix = self.prefix
+        report = SyncReport()
+        lock = threading.Lock()
+        start = time.monotonic()
+
+        try:
+            s3_client = self.session.s3_client()
+            remote = {record.object_key: (record.size, record.etag, record.mtime)
+                      for record in self.iter_records(prefix)}
+        except Exception as e:
+            raise e
+
+        def upload(path: str, object_key: str, size: int, mtime: float) -> None:
+            remote_size, remote_etag, remote_mtime = remote.get(object_key, (-1, '', 0))
+            # S3 keeps last modified times to the second
+            unchanged = remote_size == size and int(mtime) <= remote_mtime
+            if not unchanged and checksum and remote_size == size:
+                unchanged = _md5_etag(path) == remote_etag
+            if unchanged:
+                with lock:
+                    report.files_skipped += 1
+                return
+
+            try:
+                with open(path, mode='rb') as f:
+                    upload_stream(s3_client, self.bucket, object_key, f, config)
+            except Exception as e:
+                with lock:
+                    report.errors.append({'Key': object_key, 'Code': error_code(e), 'Message': str(e)})
+                return
+
+            with lock:
+                report.files_transferred += 1
+                report.bytes_transferred += size
+
+        files = ((path, prefix + relative_path, size, mtime) for path, relative_path, size, mtime in _scan(directory))
+        try:
+            run_bounded(upload, files, max_concurrency)
+        except Exception as e:
+            raise e
+        report.elapsed = time.monotonic() - start
+
+        return report
+
+    def sync_to_dir(self, directory: str, prefix: str = None, max_concurrency: int = 8,
+                    config: TransferConfig = None) -> SyncReport:
+        """Download every object under prefix (the bucket prefix by default) to directory joined with the rest of its
+        key, max_concurrency objects at a time, each with concurrent ranged GETs into a memory map of its file.
+
+        An object is skipped when a file of the same size exists and was modified no earlier than the object.
+        Objects are downloaded to a temporary file next to their file, which replaces it once complete, and
+        downloaded files get the object's last modified time. Failed objects, and objects whose key would resolve
+        outside directory (with .. segments or through a symlink), are reported as dicts with Key, Code and Message
+        in the returned SyncReport.errors.
+        """
+        if prefix is None:
+            prefix = self.prefix
+        real_directory = os.path.realpath(directory)
+        report = SyncReport()
+        lock = threading.Lock()
+        start = time.monotonic()
+
+        try:
+            s3_client = self.session.s3_client()
+        except Exception as e:
+            raise e
+
+        def download(record: S3ObjectRecord) -> None:
+            path = os.path.realpath(os.path.join(real_directory, *record.object_key[len(prefix):].split('/')))
+            if path == real_directory or os.path.commonpath([real_directory, path]) != real_directory:
+                with lock:
+                    report.errors.append({'Key': record.object_key, 'Code': 'InvalidPath',
+                                          'Message': f'{record.object_key} resolves outside {directory}'})
+                return
+
+            mtime = record.mtime
+            try:
+                stat = os.stat(path)
+                if stat.st_size == record.size and stat.st_mtime >= mtime:
+                    with lock:
+                        report.files_skipped += 1
+                    return
+            except FileNotFoundError:
+                pass
+
+            # a partly written file would have the object's size and look up to date to the next sync
+            tmp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.{uuid.uuid4().hex}.tmp')
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                download_to_file(s3_client, self.bucket, record.object_key, tmp_path, config, record.size,
+                                 record.etag)
+                os.utime(tmp_path, (mtime, mtime))
+                os.replace(tmp_path, path)
+            except Exception as e:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+                with lock:
+                    report.errors.append({'Key': record.object_key, 'Code': error_code(e), 'Message': str(e)})
+                return
+
+            with lock:
+                report.files_transferred += 1
+                report.bytes_transferred += record.size
+
+        # keys ending with / are folder placeholders
+        records = ((record,) for record in self.iter_records(prefix) if not record.object_key.endswith('/'))
+        try:
+            run_bounded(download, records, max_concurrency)
+        except Exception as e:
+            raise e
+        report.elapsed = time.monotonic() - start
+
+        return report
+
     def s3_url(self) -> str:
         if self.bucket == '':
             raise ValueError('invalid S3Bucket: undefined bucket name')
@@ -61,10 +486,32 @@ class S3Bucket:
             raise e
 
         self.region = response['BucketRegion']
+        self.session.cache_bucket_region(self.bucket, self.region)
 
         return None
 
 
+def _scan(directory: str, relative_directory: str = '') -> Iterator[tuple]:
+    """Yield (path, relative path with / separators, size, mtime) for every file under directory."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            relative_path = f'{relative_directory}{entry.name}'
+            if entry.is_dir():
+                yield from _scan(entry.path, f'{relative_path}/')
+            elif entry.is_file():
+                stat = entry.stat()
+                yield entry.path, relative_path, stat.st_size, stat.st_mtime
+
+
+def _md5_etag(path: str) -> str:
+    md5 = hashlib.md5()
+    with open(path, mode='rb') as f:
+        for b in iter(lambda: f.read(MiB), b''):
+            md5.update(b)
+
+    return f'"{md5.hexdigest()}"'
+
+
 def create_s3_bucket(aws_session: Session, bucket: str) -> S3Bucket:
     s3_client = aws_session.s3_client()
 
@@ -97,7 +544,24 @@ def new_s3_bucket(aws_session: Session, bucket: str, prefix: str = '') -> S3Buck
     return s3_bucket
 
 
+def regional_s3_client(aws_session: Session, bucket: str) -> botocore.client.BaseClient:
+    """Return the s3 client of aws_session for the region of bucket."""
+    try:
+        region = get_bucket_region(aws_session, bucket)
+    except Exception as e:
+        raise e
+
+    if region == '' or region == aws_session.boto3_session.region_name:
+        return aws_session.s3_client()
+
+    return aws_session.s3_client(region)
+
+
 def get_bucket_region(aws_session: Session, bucket: str) -> str:
+    region = aws_session.cached_bucket_region(bucket)
+    if region != '':
+        return region
+
     try:
         s3_bucket = new_s3_bucket(aws_session, bucket)
     except Exception as e:
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from typing import TYPE_CHECKING
+
+import botocore.exceptions
+
+from .s3_transfer import MiB
+
+if TYPE_CHECKING:
+    import botocore.client
+
+_TMP_SUFFIX = '.tmp'
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """CacheStats class"""
+    hits: int = 0
+    misses: int = 0
+    bytes_saved: int = 0
+    bytes_downloaded: int = 0
+    evictions: int = 0
+
+    def hit_ratio(self) -> float:
+        if self.hits + self.misses == 0:
+            return 0.0
+
+        return self.hits / (self.hits + self.misses)
+
+
+@dataclasses.dataclass
+class S3Cache:
+    """S3Cache class
+
+    Local read-through cache of object bodies, stored in directory as one file per bucket, key and ETag. Every read
+    is validated with a get_object call carrying If-None-Match, so an unchanged object costs a 304 response instead
+    of its body, and a changed object replaces the cached one. Files are evicted least recently used first once
+    they add up to more than max_bytes.
+
+    Set it as the s3_cache of a Session to have S3Object.download_bytes() and S3Object.download_view() read through
+    it. Use new_s3_cache() to pick up the files cached by earlier processes.
+    """
+    directory: str = ''
+    max_bytes: int = 1024 * MiB
+    stats: CacheStats = dataclasses.field(default_factory=CacheStats)
+    _entries: collections.OrderedDict = dataclasses.field(default_factory=collections.OrderedDict, repr=False,
+                                                          compare=False)
+    _size: int = dataclasses.field(default=0, repr=False, compare=False)
+    _lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def size(self) -> int:
+        """Total bytes of the cached files."""
+        with self._lock:
+            return self._size
+
+    def read(self, s3_client: botocore.client.BaseClient, bucket: str, object_key: str) -> memoryview:
+        """Return a read-only view of the current body of the object, memory mapped from its cached file.
+
+        The view stays valid after the file is evicted or replaced, and the mapping is released with the last
+        reference to the view.
+        """
+        name = _key_name(bucket, object_key)
+        with self._lock:
+            etag, _ = self._entries.get(name, ('', 0))
+
+        if etag != '':
+            try:
+                # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/get_object.html
+                response = s3_client.get_object(
+                    Bucket=bucket,
+                    Key=object_key,
+                    IfNoneMatch=etag,
+                )
+            except botocore.exceptions.ClientError as e:
+                if e.response['Error']['Code'] != '304':
+                    raise e
+                response = None
+            except Exception as e:
+                raise e
+
+            if response is None:
+                try:
+                    view = self._map(name, etag)
+                except FileNotFoundError:
+                    # evicted since the lookup
+                    view = None
+
+                if view is not None:
+                    with self._lock:
+                        self.stats.hits += 1
+                        self.stats.bytes_saved += len(view)
+
+                    return view
+            else:
+                return self._store(name, response)
+
+        try:
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/get_object.html
+            response = s3_client.get_object(
+                Bucket=bucket,
+                Key=object_key,
+            )
+        except Exception as e:
+            raise e
+
+        return self._store(name, response)
+
+    def clear(self) -> None:
+        """Remove every cached file."""
+        with self._lock:
+            entries = list(self._entries.items())
+            self._entries.clear()
+            self._size = 0
+
+        for name, (etag, _) in entries:
+            _remove(os.path.join(self.directory, _file_name(name, etag)))
+
+        return None
+
+    def _map(self, name: str, etag: str) -> memoryview:
+        path = os.path.join(self.directory, _file_name(name, etag))
+        with open(path, mode='rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap cannot map an empty file
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b'')
+
+        # modification times keep the LRU order across processes
+        os.utime(path)
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+
+        return view
+
+    def _store(self, name: str, response: dict) -> memoryview:
+        etag = response['ETag']
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=_TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, mode='wb') as f:
+                for chunk in response['Body'].iter_chunks(MiB):
+                    f.write(chunk)
+                size = f.tell()
+            os.replace(tmp_path, os.path.join(self.directory, _file_name(name, etag)))
+        except Exception as e:
+            _remove(tmp_path)
+            raise e
+
+        with self._lock:
+            self.stats.misses += 1
+            self.stats.bytes_downloaded += size
+
+            old_etag, old_size = self._entries.pop(name, ('', 0))
+            self._size -= old_size
+            self._entries[name] = (etag, size)
+            self._size += size
+        if old_etag not in ('', etag):
+            _remove(os.path.join(self.directory, _file_name(name, old_etag)))
+
+        # map before evicting, so a body larger than max_bytes is still returned
+        view = self._map(name, etag)
+        self._evict()
+
+        return view
+
+    def _evict(self) -> None:
+        evicted = []
+        with self._lock:
+            while self._size > self.max_bytes and self._entries:
+                name, (etag, size) = self._entries.popitem(last=False)
+                self._size -= size
+                self.stats.evictions += 1
+                evicted.append(_file_name(name, etag))
+
+        for file_name in evicted:
+            _remove(os.path.join(self.directory, file_name))
+
+        return None
+
+
+def _key_name(bucket: str, object_key: str) -> str:
+    return hashlib.sha256(f'{bucket}/{object_key}'.encode('utf-8')).hexdigest()
+
+
+def _file_name(name: str, etag: str) -> str:
+    # ETags are quoted and may come from S3 compatible stores, so they are hex encoded to make a safe file name
+    return f'{name}-{etag.encode("utf-8").hex()}'
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+    return None
+
+
+def new_s3_cache(directory: str, max_bytes: int = 1024 * MiB) -> S3Cache:
+    """Return an S3Cache over directory, creating it if needed, indexed from the files already in it with the most
+    recently used last. Temporary files left by interrupted downloads are removed."""
+    s3_cache = S3Cache()
+    s3_cache.directory = directory
+    s3_cache.max_bytes = max_bytes
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+
+        files = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(_TMP_SUFFIX):
+                    _remove(entry.path)
+                    continue
+
+                name, _, etag_hex = entry.name.partition('-')
+                try:
+                    etag = bytes.fromhex(etag_hex).decode('utf-8')
+                except ValueError:
+                    continue
+                stat = entry.stat()
+                files.append((stat.st_mtime, name, etag, stat.st_size))
+    except Exception as e:
+        raise e
+
+    for _, name, etag, size in sorted(files):
+        if name in s3_cache._entries:
+            # an older version left by an interrupted replace
+            old_etag, old_size = s3_cache._entries.pop(name)
+            s3_cache._size -= old_size
+            _remove(os.path.join(directory, _file_name(name, old_etag)))
+        s3_cache._entries[name] = (etag, size)
+        s3_cache._size += size
+    s3_cache._evict()
+
+    return s3_cache
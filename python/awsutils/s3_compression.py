@@ -0,0 +1,270 @@
+import functools
+import queue
+import threading
+import zlib
+from typing import Iterable, Iterator, Union
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+CONTENT_ENCODINGS = {
+    'gzip': GZIP,
+    'x-gzip': GZIP,
+    'zstd': ZSTD,
+}
+
+FILE_TYPE_ENCODINGS = {
+    '.gz': GZIP,
+    '.gzip': GZIP,
+    '.zst': ZSTD,
+    '.zstd': ZSTD,
+}
+
+# read size of a readable source, the compressed output gathered before it is yielded, and the largest decompressed
+# chunk yielded
+CHUNK_SIZE = 1024 * 1024
+
+# https://www.rfc-editor.org/rfc/rfc8878#section-3.1.1
+_ZSTD_MAGIC = 0xFD2FB528
+_ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+
+
+def content_encoding_for(file_type: str = '', content_encoding: str = '') -> str:
+    """Return GZIP, ZSTD or '' for an object, from its Content-Encoding header when it names one of them, else from
+    its file type."""
+    content_encoding = CONTENT_ENCODINGS.get(content_encoding.strip().lower(), '')
+    if content_encoding != '':
+        return content_encoding
+
+    return FILE_TYPE_ENCODINGS.get(file_type.lower(), '')
+
+
+def iter_compress(source: Union[Iterable[bytes], object], content_encoding: str,
+                  level: int = None) -> Iterator[bytes]:
+    """Compress a readable or an iterable of bytes-like chunks incrementally, yielding chunks of compressed data of
+    about CHUNK_SIZE bytes. level defaults to 6 for gzip and 3 for zstd."""
+    compressor = _new_compressor(content_encoding, level)
+    if hasattr(source, 'read'):
+        source = iter(functools.partial(source.read, CHUNK_SIZE), b'')
+
+    # compressors return nothing or a few bytes for most chunks
+    buffer = bytearray()
+    for chunk in source:
+        buffer += compressor.compress(chunk)
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    buffer += compressor.flush()
+    if buffer:
+        yield bytes(buffer)
+
+
+def iter_decompress(chunks: Iterable[bytes], content_encoding: str) -> Iterator[bytes]:
+    """Decompress chunks of a gzip or zstd body incrementally, yielding chunks of at most CHUNK_SIZE bytes however
+    far the body expands. Bodies of several concatenated gzip members or zstd frames, as parallel compressors write
+    them, are decompressed whole."""
+    if content_encoding == GZIP:
+        yield from _iter_gunzip(chunks)
+    elif content_encoding == ZSTD:
+        yield from _iter_unzstd(chunks)
+    else:
+        raise ValueError(f'invalid content_encoding: {content_encoding} is not one of {GZIP}, {ZSTD}')
+
+
+def iter_in_thread(iterable: Iterable[bytes], max_pending: int = 4) -> Iterator[bytes]:
+    """Yield the items of iterable, produced by a worker thread up to max_pending items ahead of the consumer.
+
+    zlib and zstandard release the GIL while they work, so compressing or decompressing in a worker overlaps with
+    the network I/O and parsing of the consumer.
+    """
+    done = object()
+    stop = threading.Event()
+    q = queue.Queue(maxsize=max_pending)
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(e)
+        put(done)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+
+def _new_compressor(content_encoding: str, level: int = None):
+    if content_encoding == GZIP:
+        # https://docs.python.org/3/library/zlib.html#zlib.compressobj, wbits 16 + 15 writes a gzip header
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    if content_encoding == ZSTD:
+        # https://python-zstandard.readthedocs.io/en/latest/compressor.html#compressobj
+        return _zstandard().ZstdCompressor(level=3 if level is None else level).compressobj()
+
+    raise ValueError(f'invalid content_encoding: {content_encoding} is not one of {GZIP}, {ZSTD}')
+
+
+def _iter_gunzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # https://docs.python.org/3/library/zlib.html#zlib.Decompress.decompress, wbits 16 + 15 reads a gzip header
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # whether the current member got any input, as the body may end right after the previous one
+    started = False
+    for chunk in chunks:
+        while True:
+            b = decompressor.decompress(chunk, CHUNK_SIZE)
+            started = started or len(chunk) > 0
+            if b:
+                yield b
+
+            if decompressor.eof:
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                started = False
+                if not chunk:
+                    break
+                continue
+
+            # a full output leaves the rest of the input in unconsumed_tail, and may leave output held by zlib
+            chunk = decompressor.unconsumed_tail
+            if not chunk and len(b) < CHUNK_SIZE:
+                break
+
+    if started:
+        raise ValueError(f'invalid {GZIP} body: truncated')
+
+
+def _iter_unzstd(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # zstandard's decompressobj returns everything its input expands to, so its stream_reader bounds the output; it
+    # silently stops at the end of its input, so the frames are followed as they stream to tell a truncated body
+    frames = _ZstdFrames()
+    source = _ChunksReader(chunks, frames.feed)
+    # https://python-zstandard.readthedocs.io/en/latest/decompressor.html#stream-reader
+    reader = _zstandard().ZstdDecompressor().stream_reader(source, read_size=CHUNK_SIZE, read_across_frames=True,
+                                                           closefd=False)
+    with reader:
+        while True:
+            b = reader.read(CHUNK_SIZE)
+            if not b:
+                break
+            yield b
+
+    if not frames.complete():
+        raise ValueError(f'invalid {ZSTD} body: truncated')
+
+
+class _ChunksReader:
+    """Readable over an iterable of bytes-like chunks, which passes what it reads to on_read."""
+
+    def __init__(self, chunks: Iterable[bytes], on_read):
+        self.chunks = iter(chunks)
+        self.on_read = on_read
+        self.pending = memoryview(b'')
+
+    def read(self, size: int = -1) -> bytes:
+        while len(self.pending) == 0:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return b''
+            self.pending = memoryview(chunk).cast('B')
+
+        if size < 0:
+            size = len(self.pending)
+        b = bytes(self.pending[:size])
+        self.pending = self.pending[size:]
+        self.on_read(b)
+
+        return b
+
+
+class _ZstdFrames:
+    """Follows the frame and block headers of a zstd body as it streams, skipping the block contents, to tell whether
+    the body ends at the end of a frame."""
+
+    def __init__(self):
+        self.state = 'magic'
+        self.header = bytearray()
+        self.skip = 0
+        self.checksum = False
+
+    def complete(self) -> bool:
+        return self.state == 'magic' and not self.header and self.skip == 0
+
+    def feed(self, b: bytes) -> None:
+        # https://www.rfc-editor.org/rfc/rfc8878#section-3.1.1
+        view = memoryview(b)
+        while len(view) > 0:
+            if self.skip > 0:
+                n = min(self.skip, len(view))
+                self.skip -= n
+                view = view[n:]
+                continue
+
+            header_size = {'magic': 4, 'descriptor': 1, 'skippable': 4, 'block': 3}[self.state]
+            n = min(header_size - len(self.header), len(view))
+            self.header += view[:n]
+            view = view[n:]
+            if len(self.header) == header_size:
+                self._parse(int.from_bytes(self.header, 'little'))
+                self.header.clear()
+
+        return None
+
+    def _parse(self, header: int) -> None:
+        if self.state == 'magic':
+            if header == _ZSTD_MAGIC:
+                self.state = 'descriptor'
+            elif header & 0xFFFFFFF0 == _ZSTD_SKIPPABLE_MAGIC:
+                self.state = 'skippable'
+            else:
+                raise ValueError(f'invalid {ZSTD} body: unknown frame magic number {header:#x}')
+        elif self.state == 'descriptor':
+            single_segment = header >> 5 & 1
+            fcs_size = (1 if single_segment else 0, 2, 4, 8)[header >> 6]
+            self.skip = (0 if single_segment else 1) + (0, 1, 2, 4)[header & 3] + fcs_size
+            self.checksum = bool(header >> 2 & 1)
+            self.state = 'block'
+        elif self.state == 'skippable':
+            self.skip = header
+            self.state = 'magic'
+        else:
+            last_block, block_type, block_size = header & 1, header >> 1 & 3, header >> 3
+            # an RLE block holds the one byte it repeats
+            self.skip = 1 if block_type == 1 else block_size
+            if last_block:
+                self.skip += 4 if self.checksum else 0
+                self.state = 'magic'
+
+        return None
+
+
+def _zstandard():
+    # zstandard is optional, and only imported once zstd is used
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError('zstd content encoding requires the zstandard package (pip install awsutils[zstd])') from e
+
+    return zstandard
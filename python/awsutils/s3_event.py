@@ -0,0 +1,218 @@
+import collections
+import dataclasses
+import json
+import threading
+import time
+from typing import Iterable, Iterator, Union
+from urllib.parse import unquote_plus
+
+
+class S3EventRecord:
+    """S3EventRecord class
+
+    One record of an S3 event notification, holding only the fields needed to act on the object. object_key is
+    URL decoded and etag is quoted as head_object returns it; size is 0 and etag is '' for delete events, which
+    carry neither.
+    """
+    __slots__ = ('event_name', 'event_time', 'region', 'bucket', 'object_key', 'size', 'etag', 'version_id',
+                 'sequencer')
+
+    def __init__(self, event_name: str = '', event_time: str = '', region: str = '', bucket: str = '',
+                 object_key: str = '', size: int = 0, etag: str = '', version_id: str = '', sequencer: str = ''):
+        self.event_name = event_name
+        self.event_time = event_time
+        self.region = region
+        self.bucket = bucket
+        self.object_key = object_key
+        self.size = size
+        self.etag = etag
+        self.version_id = version_id
+        self.sequencer = sequencer
+
+    def __repr__(self) -> str:
+        return (f'S3EventRecord(event_name={self.event_name!r}, bucket={self.bucket!r}, '
+                f'object_key={self.object_key!r}, size={self.size!r}, sequencer={self.sequencer!r})')
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, S3EventRecord):
+            return NotImplemented
+
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+
+def parse_s3_event(payload: Union[bytes, str, dict, list]) -> list:
+    """Return the S3EventRecords of an S3 event notification payload, as bytes, str or already decoded JSON.
+
+    Besides the S3 event itself, the payload may be an SNS notification wrapping it, an SQS message (a
+    receive_message dict with Body, or a Lambda SQS record with body) wrapping either, a Lambda event of SQS or SNS
+    records, or a list of any of these. Records that are not S3 records, such as s3:TestEvent, are skipped.
+    """
+    return list(iter_s3_event_records(payload))
+
+
+def iter_s3_event_records(payload: Union[bytes, str, dict, list]) -> Iterator[S3EventRecord]:
+    if isinstance(payload, (bytes, bytearray, memoryview, str)):
+        payload = json.loads(payload)
+
+    if isinstance(payload, list):
+        for item in payload:
+            yield from iter_s3_event_records(item)
+        return
+
+    if not isinstance(payload, dict):
+        raise ValueError(f'invalid S3 event payload: unexpected {type(payload).__name__}')
+
+    records = payload.get('Records')
+    if records is not None:
+        for record in records:
+            s3 = record.get('s3')
+            if s3 is not None:
+                yield _new_s3_event_record(record, s3)
+                continue
+
+            # Lambda events: SQS records carry body, SNS records carry Sns.Message
+            body = record.get('body')
+            if body is None:
+                body = record.get('Sns', {}).get('Message')
+            if body is not None:
+                yield from iter_s3_event_records(body)
+        return
+
+    # SNS notifications carry Message, SQS receive_message dicts carry Body
+    body = payload.get('Message', payload.get('Body'))
+    if isinstance(body, str):
+        yield from iter_s3_event_records(body)
+
+
+def _new_s3_event_record(record: dict, s3: dict) -> S3EventRecord:
+    s3_object = s3['object']
+    etag = s3_object.get('eTag', '')
+
+    return S3EventRecord(
+        record.get('eventName', ''),
+        record.get('eventTime', ''),
+        record.get('awsRegion', ''),
+        s3['bucket']['name'],
+        # keys are URL encoded, with spaces as +
+        unquote_plus(s3_object['key']),
+        s3_object.get('size', 0),
+        f'"{etag}"' if etag else '',
+        s3_object.get('versionId', ''),
+        s3_object.get('sequencer', ''),
+    )
+
+
+def compare_sequencers(a: str, b: str) -> int:
+    """Compare the sequencers of two events on the same key, returning -1, 0 or 1 as a is earlier than, the same as
+    or later than b. Sequencers are hex strings of varying length, compared after right padding the shorter with
+    zeros; an empty sequencer is earlier than any other."""
+    if a == '' or b == '':
+        return (a != '') - (b != '')
+
+    width = max(len(a), len(b))
+    a = a.upper().ljust(width, '0')
+    b = b.upper().ljust(width, '0')
+
+    return (a > b) - (a < b)
+
+
+@dataclasses.dataclass
+class S3EventStats:
+    """S3EventStats class"""
+    events_accepted: int = 0
+    events_duplicate: int = 0
+    events_stale: int = 0
+    events_coalesced: int = 0
+    keys_evicted: int = 0
+
+    def events_dropped(self) -> int:
+        return self.events_duplicate + self.events_stale + self.events_coalesced
+
+
+class S3EventDeduplicator:
+    """S3EventDeduplicator class
+
+    Drops S3 event records that are duplicates of, or older than, an event already seen on the same bucket and key,
+    going by their sequencers. The newest sequencer of up to max_keys keys is kept, least recently seen first out,
+    so an event on a key evicted from the index is accepted again.
+
+    With coalesce_window, accepted events wait up to that many seconds from the first event on their key, and a
+    burst of events on the key is dispatched as its newest event only. Records without a sequencer are always
+    accepted and never coalesced.
+    """
+
+    def __init__(self, max_keys: int = 100000, coalesce_window: float = 0.0):
+        self.max_keys = max_keys
+        self.coalesce_window = coalesce_window
+        self.stats = S3EventStats()
+
+        self._sequencers = collections.OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def accept(self, record: S3EventRecord) -> bool:
+        """Return whether record is newer than every event seen on its key, remembering it if so."""
+        if record.sequencer == '':
+            with self._lock:
+                self.stats.events_accepted += 1
+            return True
+
+        key = (record.bucket, record.object_key)
+        with self._lock:
+            sequencer = self._sequencers.get(key)
+            if sequencer is not None:
+                self._sequencers.move_to_end(key)
+                comparison = compare_sequencers(record.sequencer, sequencer)
+                if comparison == 0:
+                    self.stats.events_duplicate += 1
+                    return False
+                if comparison < 0:
+                    self.stats.events_stale += 1
+                    return False
+
+            self._sequencers[key] = record.sequencer
+            if len(self._sequencers) > self.max_keys:
+                self._sequencers.popitem(last=False)
+                self.stats.keys_evicted += 1
+            self.stats.events_accepted += 1
+
+        return True
+
+    def add(self, records: Iterable[S3EventRecord]) -> list:
+        """Return the records to dispatch now: without coalesce_window the accepted records in order, otherwise those
+        whose window has ended (as flush() does) once records are added."""
+        if self.coalesce_window <= 0:
+            return [record for record in records if self.accept(record)]
+
+        now = time.monotonic()
+        ready = []
+        for record in records:
+            if not self.accept(record):
+                continue
+            if record.sequencer == '':
+                ready.append(record)
+                continue
+
+            key = (record.bucket, record.object_key)
+            with self._lock:
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._pending[key] = (now, record)
+                else:
+                    self._pending[key] = (pending[0], record)
+                    self.stats.events_coalesced += 1
+
+        return ready + self.flush()
+
+    def flush(self, force: bool = False) -> list:
+        """Return the coalesced records whose window has ended, or all of them with force, oldest window first."""
+        deadline = time.monotonic() - self.coalesce_window
+        with self._lock:
+            keys = [key for key, (first, _) in self._pending.items() if force or first <= deadline]
+            ready = [self._pending.pop(key)[1] for key in keys]
+
+        return ready
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
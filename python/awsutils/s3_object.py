@@ -1,29 +1,83 @@
+import concurrent.futures
 import datetime
 import dataclasses
+import os
+from typing import Callable, ClassVar, Iterable, Iterator, Union
 
-import boto3
 import botocore.exceptions
-import pytz
 
-from .s3_bucket import get_bucket_region
+from .s3_bucket import S3Bucket, get_bucket_region, regional_s3_client
+from .s3_compression import (FILE_TYPE_ENCODINGS, content_encoding_for, iter_compress, iter_decompress,
+                             iter_in_thread)
+from .s3_event import S3EventRecord, iter_s3_event_records
+from .s3_select import FILE_FORMATS, iter_lines, iter_records
+from .s3_transfer import (TransferConfig, download_into, download_to_file, iter_download, server_side_copy,
+                          upload_stream)
 from .s3_url import split_s3_url
 from .session import Session
 
 
+class _LazyMetadata:
+    """Default value of an S3Object metadata field, which also resolves the metadata of a lazy S3Object the first
+    time any such field is read."""
+
+    def __init__(self, default):
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.name = f'_{name}'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self.default
+
+        if instance._metadata_pending:
+            instance._resolve_metadata()
+
+        return instance.__dict__.get(self.name, self.default)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+    def peek(self, instance):
+        """Return the value of the field as it stands, without resolving anything."""
+        return instance.__dict__.get(self.name, self.default)
+
+
 @dataclasses.dataclass
 class S3Object:
-    """S3Object class"""
+    """S3Object class
+
+    An S3Object built with new_s3_object(..., lazy=True) makes no request until region, etag, size, last_modified,
+    content_type or content_encoding is first read, which also happens in dataclasses.asdict. repr and == show and
+    compare these fields as they stand, unresolved or not, and make no request.
+    """
     session: Session = None
-    region: str = ''
+    region: str = _LazyMetadata('')
     bucket: str = ''
     object_key: str = ''
     file_extension: str = ''
     file_type: str = ''
-    etag: str = ''
-    size: int = 0
+    etag: str = _LazyMetadata('')
+    size: int = _LazyMetadata(0)
     storage_class: str = ''
-    last_modified: datetime.datetime = datetime.datetime(1, 1, 1, 0, 0, 0, 0, tzinfo=pytz.utc)
+    last_modified: datetime.datetime = _LazyMetadata(datetime.datetime(1, 1, 1, tzinfo=datetime.timezone.utc))
     event_name: str = ''
+    content_type: str = _LazyMetadata('')
+    content_encoding: str = _LazyMetadata('')
+
+    _metadata_pending: ClassVar[bool] = False
+
+    def __repr__(self) -> str:
+        values = ', '.join(f'{name}={value!r}' for name, value in self._peek_fields())
+
+        return f'{type(self).__name__}({values})'
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+
+        return self._peek_fields() == other._peek_fields()
 
     def exists(self) -> bool:
         try:
@@ -50,7 +104,7 @@ class S3Object:
 
         return f's3://{self.bucket}/{self.object_key}', None
 
-    def _head_object(self) -> None:
+    def _head_object(self, missing_ok: bool = True) -> None:
         s3_client = self.session.s3_client()
 
         try:
@@ -60,7 +114,7 @@ class S3Object:
                 Key=self.object_key,
             )
         except botocore.exceptions.ClientError as e:
-            if e.response['Error']['Code'] == '404':
+            if e.response['Error']['Code'] == '404' and missing_ok:
                 return None
             else:
                 raise e
@@ -72,19 +126,65 @@ class S3Object:
         # self.storage_class = response_item['StorageClass']
         self.last_modified = response['LastModified']
         self.content_type = response['ContentType']
+        self.content_encoding = response.get('ContentEncoding', '')
+
+        return None
+
+    def _peek_fields(self) -> list:
+        fields = []
+        for field in dataclasses.fields(self):
+            attribute = vars(S3Object).get(field.name)
+            if isinstance(attribute, _LazyMetadata):
+                fields.append((field.name, attribute.peek(self)))
+            else:
+                fields.append((field.name, getattr(self, field.name)))
+
+        return fields
+
+    def _refresh_metadata(self) -> None:
+        # a lazy S3Object resolves all of its metadata, region included, so that reading it makes no second request
+        if self._metadata_pending:
+            return self._resolve_metadata()
+
+        return self._head_object()
+
+    def _resolve_metadata(self, missing_ok: bool = True) -> None:
+        # cleared first, as _head_object sets (and region reads) the lazy fields
+        self._metadata_pending = False
+
+        try:
+            self.region = get_bucket_region(self.session, self.bucket)
+            self._head_object(missing_ok)
+        except Exception as e:
+            self._metadata_pending = True
+            raise e
+
+        return None
+
+    def copy(self, target, acl: str = '', config: TransferConfig = None) -> None:
+        """Copy to the bucket and object_key of the target S3Object, server side, with a single copy_object up to
+        config.copy_threshold bytes and concurrent upload_part_copy calls above it. The copy is sent to the region of
+        the target bucket, so it also works across regions.
+        """
+        try:
+            source_client = regional_s3_client(self.session, self.bucket)
+            target_client = regional_s3_client(target.session, target.bucket)
+
+            server_side_copy(source_client, self.bucket, self.object_key, target_client, target.bucket,
+                             target.object_key, config, acl)
+        except Exception as e:
+            raise e
 
         return None
 
-    def copy(self, target, acl: str = '') -> None:
+    def delete(self) -> None:
         s3_client = self.session.s3_client()
 
         try:
-            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/copy_object.html
-            _ = s3_client.copy_object(
-                ACL=acl,
-                CopySource=f'/{self.bucket}/{self.object_key}',
-                Bucket=target.bucket,
-                Key=target.key,
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/delete_object.html
+            _ = s3_client.delete_object(
+                Bucket=self.bucket,
+                Key=self.object_key,
             )
         except Exception as e:
             raise e
@@ -92,6 +192,9 @@ class S3Object:
         return None
 
     def download_bytes(self) -> bytes:
+        if self.session.s3_cache is not None:
+            return bytes(self.download_view())
+
         s3_client = self.session.s3_client()
 
         try:
@@ -106,6 +209,159 @@ class S3Object:
 
         return b
 
+    def download_view(self) -> memoryview:
+        """Return a read-only view of the object body. With the session's s3_cache, the view maps the cached file
+        without copying it, and the body is only downloaded when the cached ETag is no longer current."""
+        if self.session.s3_cache is None:
+            return memoryview(self.download_bytes())
+
+        s3_client = self.session.s3_client()
+
+        try:
+            view = self.session.s3_cache.read(s3_client, self.bucket, self.object_key)
+        except Exception as e:
+            raise e
+
+        return view
+
+    def download_into(self, buffer, config: TransferConfig = None, progress: Callable[[int], None] = None) -> int:
+        """Download into a preallocated writable buffer (bytearray, memoryview, mmap) with concurrent ranged GETs, and
+        return the object size.
+
+        Each range is retried on its own, so one failed range does not restart the transfer. progress is called from
+        the worker threads with the byte count of every completed range.
+        """
+        s3_client = self.session.s3_client()
+
+        try:
+            self._refresh_metadata()
+        except Exception as e:
+            raise e
+
+        if self.etag == '':
+            raise ValueError(f'invalid S3Object: s3://{self.bucket}/{self.object_key} does not exist')
+
+        try:
+            n = download_into(s3_client, self.bucket, self.object_key, buffer, config,
+                              size=self.size, etag=self.etag, progress=progress)
+        except Exception as e:
+            raise e
+
+        return n
+
+    def download_to_file(self, path: str, config: TransferConfig = None,
+                         progress: Callable[[int], None] = None) -> int:
+        """Download to a file at path through a memory map of the file, so ranges are written in place by the
+        worker threads without an intermediate copy, and return the object size."""
+        try:
+            self._refresh_metadata()
+        except Exception as e:
+            raise e
+
+        if self.etag == '':
+            raise ValueError(f'invalid S3Object: s3://{self.bucket}/{self.object_key} does not exist')
+
+        try:
+            n = download_to_file(self.session.s3_client(), self.bucket, self.object_key, path, config,
+                                 size=self.size, etag=self.etag, progress=progress)
+        except Exception as e:
+            raise e
+
+        return n
+
+    def download_stream(self, target, config: TransferConfig = None, decode: bool = False,
+                        threaded: bool = False) -> int:
+        """Download into a writable buffer (bytearray, memoryview, mmap) or anything with a write method, using
+        concurrent ranged GETs, and return the number of bytes downloaded.
+
+        With decode, a gzip or zstd object is decompressed into target as iter_chunks does, and the number of
+        decompressed bytes is returned; target must then have a write method.
+        """
+        try:
+            view = memoryview(target)
+        except TypeError:
+            view = None
+
+        if view is not None and not decode:
+            return self.download_into(view, config)
+
+        if not hasattr(target, 'write'):
+            raise ValueError('invalid target: decode requires a target with a write method')
+
+        try:
+            n = 0
+            for b in self.iter_chunks(config, decode, threaded):
+                target.write(b)
+                n += len(b)
+        except Exception as e:
+            raise e
+
+        return n
+
+    def iter_chunks(self, config: TransferConfig = None, decode: bool = False,
+                    threaded: bool = False) -> Iterator[bytes]:
+        """Yield the object in order, one part at a time, fetching up to config.max_concurrency parts ahead.
+
+        With decode, an object whose Content-Encoding or file type is gzip or zstd is decompressed incrementally as
+        its parts arrive, in a worker thread with threaded, so decompression overlaps with the consumer's work.
+        """
+        s3_client = self.session.s3_client()
+        chunks = iter_download(s3_client, self.bucket, self.object_key, config)
+        if not decode:
+            return chunks
+
+        try:
+            self._refresh_metadata()
+        except Exception as e:
+            raise e
+
+        content_encoding = content_encoding_for(self.file_type, self.content_encoding)
+        if content_encoding == '':
+            return chunks
+
+        chunks = iter_decompress(chunks, content_encoding)
+        if threaded:
+            chunks = iter_in_thread(chunks)
+
+        return chunks
+
+    def iter_lines(self, config: TransferConfig = None, decode: bool = True) -> Iterator[bytes]:
+        """Yield the lines of the object without their terminators, streamed and decoded as iter_chunks does."""
+        return iter_lines(self.iter_chunks(config, decode))
+
+    def iter_records(self, where: dict = None, fields: Iterable[str] = None, use_select: bool = False,
+                     file_type: str = '', header: bool = True, delimiter: str = ',',
+                     config: TransferConfig = None) -> Iterator[dict]:
+        """Yield the records of a CSV or JSON lines object as dicts, keeping those whose where fields equal their
+        values and projecting them on fields, with constant memory whatever the object size.
+
+        With use_select the filtering runs server-side in S3 Select, falling back to streaming the object when S3
+        Select is unavailable. The format follows file_type, which defaults to the object's (.csv, .json, .jsonl or
+        .ndjson). CSV values are strings, and CSV rows without header are keyed _1, _2, ... as in S3 Select.
+
+        Objects compressed with gzip or zstd, as known from their current Content-Encoding or their file type, are
+        decompressed as they stream; the format of a .jsonl.gz object is that of .jsonl.
+        """
+        try:
+            self._refresh_metadata()
+        except Exception as e:
+            raise e
+
+        file_type = file_type or self.file_type
+        content_encoding = content_encoding_for(file_type, self.content_encoding)
+        if file_type in FILE_TYPE_ENCODINGS:
+            tokens = self.object_key.split('.')
+            file_type = f'.{tokens[len(tokens) - 2].lower()}' if len(tokens) > 2 else ''
+
+        if file_type not in FILE_FORMATS:
+            raise ValueError(f'invalid S3Object: file type {file_type} of s3://{self.bucket}/{self.object_key} is '
+                             f'not one of {", ".join(FILE_FORMATS)}')
+
+        s3_client = self.session.s3_client()
+
+        return iter_records(s3_client, self.bucket, self.object_key, FILE_FORMATS[file_type], where, fields,
+                            header, delimiter, use_select, config, content_encoding)
+
     def upload_bytes(self, b: bytes) -> None:
         s3_client = self.session.s3_client()
 
@@ -116,23 +372,58 @@ class S3Object:
                 Key=self.object_key,
                 Body=b,
             )
-            self._head_object()
+            self._refresh_metadata()
+        except Exception as e:
+            raise e
+
+        return None
+
+    def upload_stream(self, source, config: TransferConfig = None, compress: bool = False, content_encoding: str = '',
+                      level: int = None, threaded: bool = False) -> None:
+        """Upload from a readable or an iterable of bytes-like chunks, as a concurrent multipart upload when the
+        source spans more than one part.
+
+        With compress, the source is compressed incrementally with content_encoding (gzip or zstd), or the encoding
+        of the file type (.gz, .zst) when not given, at level, and in a worker thread with threaded. The object's
+        Content-Encoding is set when its file type does not already tell the encoding, so a .gz object is not
+        decompressed by HTTP clients that honour Content-Encoding.
+        """
+        s3_client = self.session.s3_client()
+
+        stored_encoding = ''
+        if compress:
+            file_type_encoding = content_encoding_for(self.file_type)
+            content_encoding = content_encoding or file_type_encoding
+            if content_encoding == '':
+                raise ValueError(f'invalid S3Object: no content_encoding given to compress '
+                                 f's3://{self.bucket}/{self.object_key}, and its file type is not .gz or .zst')
+            if content_encoding != file_type_encoding:
+                stored_encoding = content_encoding
+
+            source = iter_compress(source, content_encoding, level)
+            if threaded:
+                source = iter_in_thread(source)
+
+        try:
+            upload_stream(s3_client, self.bucket, self.object_key, source, config, stored_encoding)
+            self._refresh_metadata()
         except Exception as e:
             raise e
 
         return None
 
 
-def new_s3_object_from_s3_url(aws_session: boto3.session.Session, url: str) -> S3Object:
+def new_s3_object_from_s3_url(aws_session: Session, url: str, lazy: bool = False) -> S3Object:
     try:
         split_url = split_s3_url(url)
     except Exception as e:
         raise e
 
-    return new_s3_object(aws_session, split_url['bucket'], split_url['object_key'])
+    return new_s3_object(aws_session, split_url['bucket'], split_url['objectKey'], lazy)
 
 
-def new_s3_object(aws_session: Session, bucket: str, object_key: str) -> S3Object:
+def new_s3_object(aws_session: Session, bucket: str, object_key: str, lazy: bool = False) -> S3Object:
+    """Build an S3Object, looking up its metadata with head_object now, or on first access when lazy."""
     s3_object = S3Object()
     s3_object.session = aws_session
     s3_object.bucket = bucket
@@ -144,6 +435,11 @@ def new_s3_object(aws_session: Session, bucket: str, object_key: str) -> S3Objec
         s3_object.file_extension = f'.{file_extension}'
         s3_object.file_type = f'.{file_extension.lower()}'
 
+    if lazy:
+        s3_object._metadata_pending = True
+        return s3_object
+
+    if len(tokens) > 1:
         try:
             bucket_region = get_bucket_region(s3_object.session, s3_object.bucket)
             s3_object._head_object()
@@ -152,3 +448,125 @@ def new_s3_object(aws_session: Session, bucket: str, object_key: str) -> S3Objec
         s3_object.region = bucket_region
 
     return s3_object
+
+
+def new_s3_objects(aws_session: Session, bucket: str, object_keys: Iterable[str], max_concurrency: int = 16,
+                   use_listing: bool = None) -> list:
+    """Build S3Objects for many keys of one bucket at once, and return a list of (S3Object, error) pairs in the order
+    of object_keys. A key that fails, including one that does not exist, has its S3Object set to None and its error
+    set, without affecting the other keys.
+
+    Metadata comes from head_object calls run max_concurrency at a time, or, with use_listing, from listing the
+    longest prefix the keys share first. The listing stops past the last key or once it has returned twice as many
+    objects as there are keys, and any key it did not find falls back to head_object. By default the listing is
+    used for 1000 keys or more sharing a non-empty prefix.
+    """
+    object_keys = list(object_keys)
+    results = [(None, None)] * len(object_keys)
+    if not object_keys:
+        return results
+
+    try:
+        region = get_bucket_region(aws_session, bucket)
+    except Exception as e:
+        raise e
+
+    prefix = os.path.commonprefix(object_keys)
+    if use_listing is None:
+        use_listing = len(object_keys) >= 1000 and prefix != ''
+
+    if use_listing:
+        indexes = {}
+        for i, object_key in enumerate(object_keys):
+            indexes.setdefault(object_key, []).append(i)
+
+        last_key = max(object_keys)
+        budget = 2 * len(object_keys)
+        try:
+            s3_bucket = S3Bucket(session=aws_session, region=region, bucket=bucket, prefix=prefix)
+            for s3_object in s3_bucket.iter_objects():
+                for i in indexes.get(s3_object.object_key, []):
+                    results[i] = (s3_object, None)
+
+                budget -= 1
+                if budget == 0 or s3_object.object_key >= last_key:
+                    break
+        except Exception:
+            # the head_object calls below report per key errors
+            pass
+
+    def head(object_key: str) -> tuple:
+        try:
+            s3_object = new_s3_object(aws_session, bucket, object_key, lazy=True)
+            s3_object._resolve_metadata(missing_ok=False)
+        except Exception as e:
+            return None, e
+
+        return s3_object, None
+
+    missing = [i for i, result in enumerate(results) if result[0] is None]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for i, result in zip(missing, executor.map(head, [object_keys[i] for i in missing])):
+            results[i] = result
+
+    return results
+
+
+def new_s3_object_from_listing(aws_session: Session, bucket: str, entry: dict, region: str = '') -> S3Object:
+    """Build an S3Object from a list_objects_v2 Contents entry, without any further request."""
+    s3_object = S3Object()
+    s3_object.session = aws_session
+    s3_object.region = region
+    s3_object.bucket = bucket
+    s3_object.object_key = entry['Key']
+    s3_object.etag = entry.get('ETag', '')
+    s3_object.size = entry.get('Size', 0)
+    s3_object.storage_class = entry.get('StorageClass', '')
+    s3_object.last_modified = entry.get('LastModified', s3_object.last_modified)
+
+    tokens = s3_object.object_key.split('.')
+    if len(tokens) > 1:
+        file_extension = tokens[len(tokens) - 1]
+        s3_object.file_extension = f'.{file_extension}'
+        s3_object.file_type = f'.{file_extension.lower()}'
+
+    return s3_object
+
+
+def new_s3_object_from_s3_event_record(aws_session: Session, record: S3EventRecord) -> S3Object:
+    """Build an S3Object from an S3EventRecord, without any request. last_modified is set to the event time."""
+    if record.object_key == '':
+        raise ValueError('invalid S3EventRecord: object key is empty')
+
+    s3_object = new_s3_object_from_listing(aws_session, record.bucket, {
+        'Key': record.object_key,
+        'ETag': record.etag,
+        'Size': record.size,
+    }, record.region)
+    if record.event_time != '':
+        s3_object.last_modified = datetime.datetime.fromisoformat(record.event_time.replace('Z', '+00:00'))
+    s3_object.event_name = record.event_name
+
+    return s3_object
+
+
+def new_s3_objects_from_s3_event(aws_session: Session, payload: Union[bytes, str, dict, list]) -> list:
+    """Build an S3Object for every record of an S3 event notification payload, raw or wrapped in SNS and SQS
+    messages as parse_s3_event accepts, without any request."""
+    try:
+        s3_objects = [new_s3_object_from_s3_event_record(aws_session, record)
+                      for record in iter_s3_event_records(payload)]
+    except Exception as e:
+        raise e
+
+    return s3_objects
+
+
+def new_s3_object_from_s3_event_bytes(aws_session: Session, b: bytes) -> S3Object:
+    """Build an S3Object from the first record of an S3 event notification, as NewS3ObjectFromS3EventBytes does in
+    the Go package, but without any request."""
+    s3_objects = new_s3_objects_from_s3_event(aws_session, b)
+    if not s3_objects:
+        raise ValueError('invalid S3 event: no S3 records')
+
+    return s3_objects[0]
@@ -0,0 +1,161 @@
+import array
+import datetime
+import re
+from typing import Iterable, Iterator, NamedTuple
+
+from .session import Session
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# single part ETags are the MD5 of the object, multipart ones the MD5 of the part MD5s and the part count
+_MD5_ETAG = re.compile(r'"([0-9a-f]{32})(?:-([0-9]+))?"')
+
+
+class S3ObjectRecord(NamedTuple):
+    """S3ObjectRecord class
+
+    Immutable listing entry of an S3 object, without the Session, region, datetime and dict an S3Object carries,
+    which makes it a little over half the size. mtime is the last modified time in epoch seconds.
+    """
+    bucket: str
+    object_key: str
+    size: int
+    etag: str
+    mtime: int
+    storage_class: str = ''
+
+    def last_modified(self) -> datetime.datetime:
+        return _EPOCH + datetime.timedelta(seconds=self.mtime)
+
+    def to_s3_object(self, aws_session: Session, region: str = ''):
+        """Return the S3Object of the record, without any request."""
+        # s3_object imports s3_bucket, which imports this module
+        from .s3_object import new_s3_object_from_listing
+
+        return new_s3_object_from_listing(aws_session, self.bucket, {
+            'Key': self.object_key,
+            'ETag': self.etag,
+            'Size': self.size,
+            'StorageClass': self.storage_class,
+            'LastModified': self.last_modified(),
+        }, region)
+
+
+class S3ObjectBatch:
+    """S3ObjectBatch class
+
+    Columnar store of the listing entries of one bucket, in arrays rather than one object per entry: keys are kept
+    UTF-8 encoded back to back, sizes and mtimes as 64 bit integers, and MD5 ETags as their 16 bytes plus a part
+    count, which is how S3 forms them. An entry costs about its key length plus 50 bytes: for 48 character keys,
+    about 95 MiB per million entries against 330 MiB as S3ObjectRecords and 580 MiB as S3Objects (see
+    benchmarks/bench_s3_record.py).
+
+    Indexing or iterating yields S3ObjectRecords, built on demand.
+    """
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+        self._keys = bytearray()
+        self._key_ends = array.array('q')
+        self._sizes = array.array('q')
+        self._mtimes = array.array('q')
+        self._etags = bytearray()
+        self._etag_parts = array.array('i')
+        self._storage_classes = array.array('B')
+        self._storage_class_names = ['']
+        # ETags that are not an MD5, from S3 compatible stores
+        self._other_etags = {}
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def __getitem__(self, i: int) -> S3ObjectRecord:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('S3ObjectBatch index out of range')
+
+        return S3ObjectRecord(self.bucket, self.object_key(i), self._sizes[i], self._etag(i), self._mtimes[i],
+                              self._storage_class_names[self._storage_classes[i]])
+
+    def __iter__(self) -> Iterator[S3ObjectRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, object_key: str, size: int, etag: str, mtime: int, storage_class: str = '') -> None:
+        self._keys += object_key.encode('utf-8')
+        self._key_ends.append(len(self._keys))
+        self._sizes.append(size)
+        self._mtimes.append(mtime)
+
+        match = _MD5_ETAG.fullmatch(etag)
+        if match is not None:
+            self._etags += bytes.fromhex(match.group(1))
+            self._etag_parts.append(int(match.group(2)) if match.group(2) else -1)
+        else:
+            self._etags += bytes(16)
+            self._etag_parts.append(-2)
+            self._other_etags[len(self._sizes) - 1] = etag
+
+        try:
+            storage_class_index = self._storage_class_names.index(storage_class)
+        except ValueError:
+            storage_class_index = len(self._storage_class_names)
+            self._storage_class_names.append(storage_class)
+        self._storage_classes.append(storage_class_index)
+
+        return None
+
+    def append_entries(self, entries: Iterable[dict]) -> None:
+        """Append list_objects_v2 Contents entries."""
+        for entry in entries:
+            self.append(entry['Key'], entry.get('Size', 0), entry.get('ETag', ''),
+                        int(entry['LastModified'].timestamp()) if 'LastModified' in entry else 0,
+                        entry.get('StorageClass', ''))
+
+        return None
+
+    def object_key(self, i: int) -> str:
+        start = self._key_ends[i - 1] if i > 0 else 0
+
+        return self._keys[start:self._key_ends[i]].decode('utf-8')
+
+    def object_keys(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.object_key(i)
+
+    def total_size(self) -> int:
+        return sum(self._sizes)
+
+    def to_s3_object(self, i: int, aws_session: Session, region: str = ''):
+        return self[i].to_s3_object(aws_session, region)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the batch's arrays."""
+        arrays = (self._key_ends, self._sizes, self._mtimes, self._etag_parts, self._storage_classes)
+
+        return len(self._keys) + len(self._etags) + sum(a.itemsize * len(a) for a in arrays) + \
+            sum(len(etag) + 100 for etag in self._other_etags.values())
+
+    def _etag(self, i: int) -> str:
+        parts = self._etag_parts[i]
+        if parts == -2:
+            return self._other_etags[i]
+
+        md5 = self._etags[16 * i:16 * (i + 1)].hex()
+        if parts == -1:
+            return f'"{md5}"'
+
+        return f'"{md5}-{parts}"'
+
+
+def new_s3_object_record_from_listing(bucket: str, entry: dict) -> S3ObjectRecord:
+    """Build an S3ObjectRecord from a list_objects_v2 Contents entry."""
+    return S3ObjectRecord(
+        bucket,
+        entry['Key'],
+        entry.get('Size', 0),
+        entry.get('ETag', ''),
+        int(entry['LastModified'].timestamp()) if 'LastModified' in entry else 0,
+        entry.get('StorageClass', ''),
+    )
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import csv
+import json
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import botocore.exceptions
+
+from .s3_compression import GZIP, iter_decompress
+from .s3_transfer import TransferConfig, iter_download
+
+if TYPE_CHECKING:
+    import botocore.client
+
+CSV = 'CSV'
+JSON_LINES = 'JSON_LINES'
+
+FILE_FORMATS = {
+    '.csv': CSV,
+    '.json': JSON_LINES,
+    '.jsonl': JSON_LINES,
+    '.ndjson': JSON_LINES,
+}
+
+# returned where S3 Select is not offered: to accounts that never used it, and by most S3 compatible stores
+SELECT_UNAVAILABLE_ERROR_CODES = frozenset([
+    'MethodNotAllowed',
+    'NotImplemented',
+    'XNotImplemented',
+])
+
+# https://docs.aws.amazon.com/AmazonS3/latest/API/API_InputSerialization.html
+SELECT_COMPRESSION_TYPES = {
+    '': 'NONE',
+    GZIP: 'GZIP',
+}
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Yield the lines of a body given as chunks, without their \\n or \\r\\n terminators, holding no more than a chunk
+    and the line that spans it."""
+    pending = b''
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line[:-1] if line.endswith(b'\r') else line
+
+    if pending != b'':
+        yield pending[:-1] if pending.endswith(b'\r') else pending
+
+
+def iter_json_lines(chunks: Iterable[bytes], encoding: str = 'utf-8') -> Iterator[dict]:
+    """Yield the JSON value of every non-blank line of a body given as chunks."""
+    for line in _iter_text_lines(chunks, encoding):
+        if line != '' and not line.isspace():
+            yield json.loads(line)
+
+
+def iter_csv_records(chunks: Iterable[bytes], header: bool = True, delimiter: str = ',',
+                     encoding: str = 'utf-8') -> Iterator[dict]:
+    """Yield the rows of a CSV body given as chunks as dicts, keyed by the header row or, without one, by column
+    position as _1, _2, ... the way S3 Select names them. Quoted fields may span lines and chunks."""
+    # csv joins the lines of a quoted field again
+    rows = csv.reader((line + '\n' for line in _iter_text_lines(chunks, encoding)), delimiter=delimiter)
+    if header:
+        fields = next(rows, None)
+        if fields is None:
+            return
+    for row in rows:
+        if not header:
+            fields = [f'_{i + 1}' for i in range(len(row))]
+        yield dict(zip(fields, row))
+
+
+def select_expression(where: dict = None, fields: Iterable[str] = None) -> str:
+    """Return the S3 Select SQL expression of the records whose where fields all equal their values, projected on
+    fields. Values may be str, int, float or bool; CSV fields are always compared as strings."""
+    projection = ', '.join(f's.{_quote_field(field)}' for field in fields) if fields else '*'
+    expression = f'SELECT {projection} FROM S3Object s'
+    if where:
+        expression += ' WHERE ' + ' AND '.join(f's.{_quote_field(field)} = {_literal(value)}'
+                                                 for field, value in where.items())
+
+    return expression
+
+
+def matches(record: dict, where: dict = None) -> bool:
+    """Client-side equivalent of the WHERE clause of select_expression."""
+    if not where:
+        return True
+
+    return all(field in record and record[field] == value for field, value in where.items())
+
+
+def iter_records(s3_client: botocore.client.BaseClient, bucket: str, object_key: str, file_format: str,
+                 where: dict = None, fields: Iterable[str] = None, header: bool = True, delimiter: str = ',',
+                 use_select: bool = False, config: TransferConfig = None,
+                 content_encoding: str = '') -> Iterator[dict]:
+    """Yield the records of a CSV or JSON lines object that match where (see select_expression), projected on fields.
+
+    With use_select, S3 Select filters the object server-side and only matching records are transferred. Where S3
+    Select is unavailable, and always without use_select, the object is streamed with concurrent ranged GETs and
+    filtered client-side; either way memory is bounded by config, whatever the object size. A gzip or zstd
+    content_encoding is decompressed as the object streams; S3 Select reads gzip but not zstd.
+    """
+    if file_format not in (CSV, JSON_LINES):
+        raise ValueError(f'invalid file_format: {file_format} is not one of {CSV}, {JSON_LINES}')
+    fields = list(fields) if fields else None
+
+    if use_select and content_encoding in SELECT_COMPRESSION_TYPES:
+        try:
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/select_object_content.html
+            response = s3_client.select_object_content(
+                Bucket=bucket,
+                Key=object_key,
+                Expression=select_expression(where, fields),
+                ExpressionType='SQL',
+                InputSerialization=_input_serialization(file_format, header, delimiter, content_encoding),
+                OutputSerialization={'JSON': {'RecordDelimiter': '\n'}},
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] not in SELECT_UNAVAILABLE_ERROR_CODES:
+                raise e
+            response = None
+        except Exception as e:
+            raise e
+
+        if response is not None:
+            yield from iter_json_lines(_iter_select_payload(response))
+            return
+
+    chunks = iter_download(s3_client, bucket, object_key, config)
+    if content_encoding != '':
+        chunks = iter_decompress(chunks, content_encoding)
+    if file_format == CSV:
+        records = iter_csv_records(chunks, header, delimiter)
+    else:
+        records = iter_json_lines(chunks)
+
+    if not where and fields is None:
+        yield from records
+        return
+
+    for record in records:
+        if not matches(record, where):
+            continue
+        if fields is not None:
+            record = {field: record[field] for field in fields if field in record}
+        yield record
+
+
+def _iter_text_lines(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    # decoding the complete lines of a chunk at once is much faster than decoding line by line; encoding must be
+    # ASCII compatible, as lines are split on the \n byte
+    pending = b''
+    for chunk in chunks:
+        b = pending + chunk
+        end = b.rfind(b'\n') + 1
+        pending = b[end:]
+        if end > 0:
+            yield from b[:end - 1].decode(encoding).split('\n')
+
+    if pending != b'':
+        yield pending.decode(encoding)
+
+
+def _iter_select_payload(response: dict) -> Iterator[bytes]:
+    # Records events split the output at arbitrary bytes, not at record boundaries
+    for event in response['Payload']:
+        if 'Records' in event:
+            yield event['Records']['Payload']
+
+
+def _input_serialization(file_format: str, header: bool, delimiter: str, content_encoding: str) -> dict:
+    # https://docs.aws.amazon.com/AmazonS3/latest/API/API_InputSerialization.html
+    if file_format == CSV:
+        return {
+            'CSV': {
+                'FileHeaderInfo': 'USE' if header else 'NONE',
+                'FieldDelimiter': delimiter,
+                'AllowQuotedRecordDelimiter': True,
+            },
+            'CompressionType': SELECT_COMPRESSION_TYPES[content_encoding],
+        }
+
+    return {
+        'JSON': {'Type': 'LINES'},
+        'CompressionType': SELECT_COMPRESSION_TYPES[content_encoding],
+    }
+
+
+def _quote_field(field: str) -> str:
+    return '"' + field.replace('"', '""') + '"'
+
+
+def _literal(value) -> str:
+    # bool before int, as bool is an int
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+
+    raise ValueError(f'invalid where value: {value!r} is not a str, int, float or bool')
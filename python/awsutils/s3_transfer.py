@@ -0,0 +1,455 @@
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import dataclasses
+import itertools
+import mmap
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Union
+
+import botocore.exceptions
+
+if TYPE_CHECKING:
+    import botocore.client
+
+MiB = 1024 * 1024
+
+# https://docs.aws.amazon.com/AmazonS3/latest/userguide/qfacts.html
+MIN_PART_SIZE = 5 * MiB
+MAX_PARTS = 10000
+
+# head_object fields that copy_object keeps with its default COPY MetadataDirective, and create_multipart_upload
+# accepts
+COPIED_HEADERS = ('CacheControl', 'ContentDisposition', 'ContentEncoding', 'ContentLanguage', 'ContentType', 'Expires',
+                  'Metadata')
+
+
+@dataclasses.dataclass
+class TransferConfig:
+    """TransferConfig class
+
+    At most max_concurrency parts of part_size bytes are held in memory by a transfer at any time, whatever the size
+    of the object. Copies of objects larger than copy_threshold run as concurrent upload_part_copy calls.
+    """
+    part_size: int = 8 * MiB
+    max_concurrency: int = 10
+    max_range_attempts: int = 3
+    copy_threshold: int = 64 * MiB
+
+    def validate(self) -> None:
+        if self.part_size < MIN_PART_SIZE:
+            raise ValueError(f'invalid TransferConfig: part_size must be at least {MIN_PART_SIZE} bytes')
+
+        if self.max_concurrency < 1:
+            raise ValueError('invalid TransferConfig: max_concurrency must be at least 1')
+
+        if self.max_range_attempts < 1:
+            raise ValueError('invalid TransferConfig: max_range_attempts must be at least 1')
+
+        # https://docs.aws.amazon.com/AmazonS3/latest/API/API_CopyObject.html
+        if self.copy_threshold > 5 * 1024 * MiB:
+            raise ValueError('invalid TransferConfig: copy_threshold must be at most 5 GiB')
+
+        return None
+
+
+def iter_parts(source: Union[Iterable[bytes], object], part_size: int) -> Iterator[bytes]:
+    """Split a readable (anything with a read method) or an iterable of bytes-like chunks into part_size pieces.
+
+    Every piece except the last is exactly part_size bytes long.
+    """
+    if hasattr(source, 'read'):
+        while True:
+            b = source.read(part_size)
+            if not b:
+                return
+
+            # raw and socket streams may return short reads before the end of the stream
+            if len(b) < part_size:
+                buffer = bytearray(b)
+                while len(buffer) < part_size:
+                    b = source.read(part_size - len(buffer))
+                    if not b:
+                        break
+                    buffer += b
+                b = bytes(buffer)
+
+            yield b
+
+            if len(b) < part_size:
+                return
+
+    buffer = bytearray()
+    for chunk in source:
+        buffer += chunk
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+
+    if buffer:
+        yield bytes(buffer)
+
+
+def upload_stream(s3_client: botocore.client.BaseClient, bucket: str, object_key: str, source,
+                  config: TransferConfig = None, content_encoding: str = '') -> None:
+    """Upload a readable or an iterable of bytes-like chunks, as a multipart upload when it spans several parts.
+    content_encoding, when given, is stored as the object's Content-Encoding."""
+    config = config or TransferConfig()
+    config.validate()
+    extra_args = {'ContentEncoding': content_encoding} if content_encoding != '' else {}
+
+    parts = iter_parts(source, config.part_size)
+    first = next(parts, b'')
+    second = next(parts, None)
+
+    if second is None:
+        try:
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/put_object.html
+            _ = s3_client.put_object(
+                Bucket=bucket,
+                Key=object_key,
+                Body=first,
+                **extra_args,
+            )
+        except Exception as e:
+            raise e
+
+        return None
+
+    try:
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/create_multipart_upload.html
+        response = s3_client.create_multipart_upload(
+            Bucket=bucket,
+            Key=object_key,
+            **extra_args,
+        )
+    except Exception as e:
+        raise e
+    upload_id = response['UploadId']
+
+    def upload_part(part_number: int, body: bytes) -> dict:
+        if part_number > MAX_PARTS:
+            raise ValueError(f'invalid TransferConfig: part_size is too small to upload in {MAX_PARTS} parts')
+
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/upload_part.html
+        part_response = s3_client.upload_part(
+            Bucket=bucket,
+            Key=object_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+
+        return {'ETag': part_response['ETag'], 'PartNumber': part_number}
+
+    try:
+        completed_parts = run_bounded(
+            upload_part,
+            enumerate(itertools.chain((first, second), parts), start=1),
+            config.max_concurrency,
+        )
+
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/complete_multipart_upload.html
+        _ = s3_client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=object_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': completed_parts},
+        )
+    except Exception as e:
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/abort_multipart_upload.html
+        s3_client.abort_multipart_upload(
+            Bucket=bucket,
+            Key=object_key,
+            UploadId=upload_id,
+        )
+        raise e
+
+    return None
+
+
+def download_into(s3_client: botocore.client.BaseClient, bucket: str, object_key: str, buffer,
+                  config: TransferConfig = None, size: int = None, etag: str = None,
+                  progress: Callable[[int], None] = None) -> int:
+    """Download an object with concurrent ranged GETs written in place into a writable buffer (bytearray, memoryview,
+    mmap), and return the object size.
+
+    size and etag are looked up with head_object unless given. Each range is retried on its own up to
+    config.max_range_attempts times, and progress is called from the worker threads with the byte count of every
+    completed range.
+    """
+    config = config or TransferConfig()
+    config.validate()
+
+    # the view and its slices are released whatever happens, as an mmap with exported pointers cannot be closed
+    with memoryview(buffer).cast('B') as view:
+        if view.readonly:
+            raise ValueError('invalid buffer: must be writable')
+
+        if size is None or etag is None:
+            size, etag, _ = _object_size(s3_client, bucket, object_key)
+        if len(view) < size:
+            raise ValueError(f'invalid buffer: {len(view)} bytes is too small for a {size} byte object')
+
+        def download_range(start: int, end: int) -> None:
+            with view[start:end] as part:
+                _get_range_into(s3_client, bucket, object_key, etag, start, part, config.max_range_attempts)
+            if progress is not None:
+                progress(end - start)
+
+        run_bounded(download_range, _ranges(size, config.part_size), config.max_concurrency)
+
+    return size
+
+
+def download_to_file(s3_client: botocore.client.BaseClient, bucket: str, object_key: str, path: str,
+                     config: TransferConfig = None, size: int = None, etag: str = None,
+                     progress: Callable[[int], None] = None) -> int:
+    """download_into a memory map of the file at path, which is created or truncated to the object size."""
+    if size is None or etag is None:
+        size, etag, _ = _object_size(s3_client, bucket, object_key)
+
+    with open(path, mode='w+b') as f:
+        if size == 0:
+            return 0
+
+        os.truncate(f.fileno(), size)
+        with mmap.mmap(f.fileno(), size) as m:
+            n = download_into(s3_client, bucket, object_key, m, config, size, etag, progress)
+            m.flush()
+
+    return n
+
+
+def iter_download(s3_client: botocore.client.BaseClient, bucket: str, object_key: str,
+                  config: TransferConfig = None, progress: Callable[[int], None] = None) -> Iterator[bytes]:
+    """Download an object with concurrent ranged GETs and yield its parts in order."""
+    config = config or TransferConfig()
+    config.validate()
+
+    size, etag, _ = _object_size(s3_client, bucket, object_key)
+
+    def download_range(start: int, end: int) -> bytes:
+        b = bytearray(end - start)
+        _get_range_into(s3_client, bucket, object_key, etag, start, memoryview(b), config.max_range_attempts)
+        if progress is not None:
+            progress(end - start)
+        return bytes(b)
+
+    ranges = _ranges(size, config.part_size)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=config.max_concurrency)
+    pending = collections.deque()
+    try:
+        for start, end in itertools.islice(ranges, config.max_concurrency):
+            pending.append(executor.submit(download_range, start, end))
+
+        while pending:
+            b = pending.popleft().result()
+
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(executor.submit(download_range, *next_range))
+
+            yield b
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def server_side_copy(source_client: botocore.client.BaseClient, source_bucket: str, source_key: str,
+                     target_client: botocore.client.BaseClient, target_bucket: str, target_key: str,
+                     config: TransferConfig = None, acl: str = '', size: int = None, etag: str = None) -> None:
+    """Copy an object within S3, with copy_object up to config.copy_threshold bytes and concurrent
+    upload_part_copy calls above it.
+
+    target_client must be a client for the region of target_bucket; S3 reads the source across regions itself.
+    size and etag of the source are looked up with source_client unless given. Either way, the target keeps the
+    source's Content-Type, Content-Encoding, Cache-Control and other COPIED_HEADERS, and its user metadata.
+    """
+    config = config or TransferConfig()
+    config.validate()
+
+    optional_args = {}
+    if acl != '':
+        optional_args['ACL'] = acl
+
+    headers = None
+    if size is None or etag is None:
+        size, etag, headers = _object_size(source_client, source_bucket, source_key)
+    copy_source = {'Bucket': source_bucket, 'Key': source_key}
+
+    if size <= config.copy_threshold:
+        try:
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/copy_object.html
+            _ = target_client.copy_object(
+                CopySource=copy_source,
+                CopySourceIfMatch=etag,
+                Bucket=target_bucket,
+                Key=target_key,
+                **optional_args,
+            )
+        except Exception as e:
+            raise e
+
+        return None
+
+    try:
+        # unlike copy_object, a multipart upload starts without any of the source's headers
+        if headers is None:
+            _, _, headers = _object_size(source_client, source_bucket, source_key)
+
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/create_multipart_upload.html
+        response = target_client.create_multipart_upload(
+            Bucket=target_bucket,
+            Key=target_key,
+            **headers,
+            **optional_args,
+        )
+    except Exception as e:
+        raise e
+    upload_id = response['UploadId']
+
+    # parts are copied by S3 rather than held in memory, so only the part count limit bounds their size
+    part_size = max(config.part_size, -(-size // MAX_PARTS))
+
+    def copy_part(part_number: int, start: int, end: int) -> dict:
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/upload_part_copy.html
+        part_response = target_client.upload_part_copy(
+            Bucket=target_bucket,
+            Key=target_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            CopySource=copy_source,
+            CopySourceIfMatch=etag,
+            CopySourceRange=f'bytes={start}-{end - 1}',
+        )
+
+        return {'ETag': part_response['CopyPartResult']['ETag'], 'PartNumber': part_number}
+
+    try:
+        completed_parts = run_bounded(
+            copy_part,
+            ((part_number, start, end) for part_number, (start, end) in enumerate(_ranges(size, part_size), start=1)),
+            config.max_concurrency,
+        )
+
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/complete_multipart_upload.html
+        _ = target_client.complete_multipart_upload(
+            Bucket=target_bucket,
+            Key=target_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': completed_parts},
+        )
+    except Exception as e:
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/abort_multipart_upload.html
+        target_client.abort_multipart_upload(
+            Bucket=target_bucket,
+            Key=target_key,
+            UploadId=upload_id,
+        )
+        raise e
+
+    return None
+
+
+def _ranges(size: int, part_size: int) -> Iterator[tuple]:
+    return ((start, min(start + part_size, size)) for start in range(0, size, part_size))
+
+
+def _object_size(s3_client: botocore.client.BaseClient, bucket: str, object_key: str) -> tuple:
+    try:
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/head_object.html
+        response = s3_client.head_object(
+            Bucket=bucket,
+            Key=object_key,
+        )
+    except Exception as e:
+        raise e
+
+    headers = {header: response[header] for header in COPIED_HEADERS if response.get(header)}
+
+    return response['ContentLength'], response['ETag'], headers
+
+
+def _get_range_into(s3_client: botocore.client.BaseClient, bucket: str, object_key: str, etag: str, start: int,
+                    view: memoryview, max_attempts: int) -> None:
+    attempt = 1
+    while True:
+        try:
+            return _read_range_into(s3_client, bucket, object_key, etag, start, view)
+        except Exception as e:
+            if attempt >= max_attempts or not _is_retryable_range_error(e):
+                raise e
+
+        time.sleep(min(0.1 * 2 ** attempt, 2.0))
+        attempt += 1
+
+
+def _read_range_into(s3_client: botocore.client.BaseClient, bucket: str, object_key: str, etag: str, start: int,
+                     view: memoryview) -> None:
+    # IfMatch makes every range fail rather than mix bytes from two versions of an object overwritten mid transfer
+    # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3/client/get_object.html
+    response = s3_client.get_object(
+        Bucket=bucket,
+        Key=object_key,
+        Range=f'bytes={start}-{start + len(view) - 1}',
+        IfMatch=etag,
+    )
+
+    body = response['Body']
+    offset = 0
+    try:
+        while offset < len(view):
+            with view[offset:] as part:
+                n = body.readinto(part)
+            if n == 0:
+                raise IOError(f'short read: got {offset} of {len(view)} bytes at offset {start}')
+            offset += n
+    finally:
+        body.close()
+
+    return None
+
+
+def _is_retryable_range_error(e: Exception) -> bool:
+    # a failed precondition means the object changed, so retrying the range cannot succeed
+    if isinstance(e, botocore.exceptions.ClientError):
+        code = e.response['Error']['Code']
+        status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        return status >= 500 or code in ('SlowDown', 'RequestTimeout', 'InternalError')
+
+    return isinstance(e, (botocore.exceptions.BotoCoreError, IOError))
+
+
+def run_bounded(fn, args: Iterable, max_concurrency: int) -> list:
+    """Run fn over args on a thread pool with at most max_concurrency calls submitted but not finished, and return
+    the results in input order. args is consumed lazily, so a generator of large arguments stays bounded in memory.
+    """
+    slots = threading.BoundedSemaphore(max_concurrency)
+    errors = []
+    futures = []
+
+    def release(future: concurrent.futures.Future) -> None:
+        if future.exception() is not None:
+            errors.append(future.exception())
+        slots.release()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for arg in args:
+            slots.acquire()
+            if errors:
+                slots.release()
+                break
+
+            future = executor.submit(fn, *arg)
+            future.add_done_callback(release)
+            futures.append(future)
+
+    if errors:
+        raise errors[0]
+
+    return [future.result() for future in futures]
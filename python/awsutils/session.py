@@ -1,44 +1,284 @@
+from __future__ import annotations
+
+import concurrent.futures
 import dataclasses
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from .connection_pool import DEFAULT_POOL_CONNECTIONS, PoolMonitor, PoolStats
+from .instrumentation import CallTracer, Instrumentation
+from .retry import RetryConfig, RetryHandler, RetryStats
+from .s3_cache import S3Cache
+
+# boto3 and botocore take most of the import time of awsutils, so they are imported once a Session or client is built
+if TYPE_CHECKING:
+    import boto3.session
+    import botocore.client
+
+
+class _ClientOption:
+    """Default value of a Session field that its clients are built with, which also closes and drops the cached
+    clients when the field is set, so that every client built afterwards uses the new value."""
+
+    def __init__(self, default):
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.name = f'_{name}'
 
-import boto3.session
-import botocore.client
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self.default
+
+        return instance.__dict__.get(self.name, self.default)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+        # not while __init__ sets the fields, before there is a client cache
+        if '_clients' in instance.__dict__:
+            instance.invalidate_clients()
+
+
+@dataclasses.dataclass
+class ClientCacheStats:
+    """ClientCacheStats class"""
+    hits: int = 0
+    builds: int = 0
+    invalidations: int = 0
 
 
 @dataclasses.dataclass
 class Session:
-    """Session class"""
+    """Session class
+
+    Clients are cached per (service, region, endpoint_url) and shared by every S3Bucket, S3Object, SqsQueue and
+    SnsTopic built from this Session, so repeated calls reuse the same connection pool. botocore clients are safe
+    to share between threads once built.
+
+    Bucket regions are cached for bucket_region_ttl seconds, so they are looked up once per bucket rather than once
+    per S3Object.
+
+    When s3_cache is set, S3Object.download_bytes() and S3Object.download_view() read through it.
+
+    When retry_config is set, as it is by default, clients are built with botocore's own retries turned off and
+    a RetryHandler per service and region instead, counting into retry_stats. Set it to None to keep the retries
+    configured in boto3_config.
+
+    max_pool_connections sets the connection pool size of a service's clients, overriding boto3_config; give each
+    pool at least as many connections as threads calling the service at once. pool_stats tracks the use of each
+    (service, region) pool.
+
+    When instrumentation is set, for example to a MetricsAggregator, it receives a CallRecord for every call made
+    through this Session's clients. Setting it closes the cached clients, as clients are traced from when they are
+    built, so set it before the clients are shared between threads.
+    """
     boto3_session: boto3.session.Session = None
     boto3_config: boto3.session.Config = None
     endpoint_url: str = None
+    bucket_region_ttl: float = 3600.0
+    s3_cache: S3Cache = None
+    retry_config: RetryConfig = dataclasses.field(default_factory=RetryConfig)
+    retry_stats: RetryStats = dataclasses.field(default_factory=RetryStats)
+    max_pool_connections: dict = dataclasses.field(default_factory=dict)
+    tcp_keepalive: bool = False
+    client_cache_stats: ClientCacheStats = dataclasses.field(default_factory=ClientCacheStats)
+    pool_stats: dict = dataclasses.field(default_factory=dict)
+    instrumentation: Instrumentation = _ClientOption(None)
+    _clients: dict = dataclasses.field(default_factory=dict, repr=False, compare=False)
+    _clients_lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+    _bucket_regions: dict = dataclasses.field(default_factory=dict, repr=False, compare=False)
+    _bucket_regions_lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+    _retry_handlers: dict = dataclasses.field(default_factory=dict, repr=False, compare=False)
+    _retry_stats_lock: threading.Lock = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+    _pool_monitors: dict = dataclasses.field(default_factory=dict, repr=False, compare=False)
+
+    def s3_client(self, region: str = None) -> botocore.client.BaseClient:
+        return self._client('s3', region)
+
+    def sns_client(self, region: str = None) -> botocore.client.BaseClient:
+        return self._client('sns', region)
+
+    def sqs_client(self, region: str = None) -> botocore.client.BaseClient:
+        return self._client('sqs', region)
+
+    def invalidate_clients(self, service: str = None) -> None:
+        """Close and drop cached clients, for all services or only for the given one."""
+        with self._clients_lock:
+            keys = [k for k in self._clients if service is None or k[0] == service]
+            clients = [self._clients.pop(k) for k in keys]
+            self.client_cache_stats.invalidations += len(clients)
+
+        for client in clients:
+            client.close()
+
+        return None
+
+    def close(self) -> None:
+        return self.invalidate_clients()
+
+    def reserve_pool_connections(self, connections: int, services: tuple = ('s3', 'sns', 'sqs')) -> None:
+        """Grow the connection pools of services to at least connections, rebuilding their cached clients. Call it
+        before the clients are shared between threads, as the old clients are closed."""
+        for service in services:
+            if self._pool_size(service) >= connections:
+                continue
 
-    def s3_client(self) -> botocore.client.BaseClient:
-        return self._client('s3')
+            self.max_pool_connections[service] = connections
+            self.invalidate_clients(service)
 
-    def sns_client(self) -> botocore.client.BaseClient:
-        return self._client('sns')
+        return None
 
-    def sqs_client(self) -> botocore.client.BaseClient:
-        return self._client('sqs')
+    def warm_up(self, service: str, connections: int = None, region: str = None) -> None:
+        """Open up to connections (by default the pool size) connections of the service's client ahead of use, with
+        as many concurrent lightweight calls held until all are ready to send."""
+        connections = connections or self._pool_size(service)
+        client = self._client(service, region)
+        operation, params = _WARM_UP_CALLS[service]
+        barrier = threading.Barrier(connections)
+        warming = set()
 
-    def _client(self, service: str) -> botocore.client.BaseClient:
+        def hold(**kwargs) -> None:
+            if threading.get_ident() in warming:
+                try:
+                    barrier.wait(timeout=5.0)
+                except threading.BrokenBarrierError:
+                    pass
+
+        def call() -> None:
+            warming.add(threading.get_ident())
+            try:
+                getattr(client, operation)(**params)
+            except Exception:
+                # access denied and similar errors still leave an open connection
+                pass
+            finally:
+                warming.discard(threading.get_ident())
+
+        service_id = client.meta.service_model.service_id.hyphenize()
+        client.meta.events.register_last(f'before-send.{service_id}', hold)
         try:
-            client = self.boto3_session.client(service, endpoint_url=self.endpoint_url, config=self.boto3_config)
-        except Exception as e:
-            raise e
+            with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+                for _ in range(connections):
+                    executor.submit(call)
+        finally:
+            client.meta.events.unregister(f'before-send.{service_id}', hold)
+
+        return None
+
+    def cached_bucket_region(self, bucket: str) -> str:
+        """Return the cached region of bucket, or '' when it is unknown or older than bucket_region_ttl."""
+        with self._bucket_regions_lock:
+            region, expires = self._bucket_regions.get(bucket, ('', 0.0))
+
+        if time.monotonic() >= expires:
+            return ''
+
+        return region
+
+    def cache_bucket_region(self, bucket: str, region: str) -> None:
+        with self._bucket_regions_lock:
+            self._bucket_regions[bucket] = (region, time.monotonic() + self.bucket_region_ttl)
+
+        return None
+
+    def invalidate_bucket_regions(self) -> None:
+        with self._bucket_regions_lock:
+            self._bucket_regions.clear()
+
+        return None
+
+    def _client(self, service: str, region: str = None) -> botocore.client.BaseClient:
+        key = (service, region, self.endpoint_url)
+
+        # boto3.session.Session is not thread safe, so clients are also built while holding the lock
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.client_cache_stats.hits += 1
+                return client
+
+            import botocore.config
+
+            config = self.boto3_config
+            pool_config = {}
+            if service in self.max_pool_connections:
+                pool_config['max_pool_connections'] = self.max_pool_connections[service]
+            if self.tcp_keepalive:
+                pool_config['tcp_keepalive'] = True
+            if pool_config:
+                config = (config or botocore.config.Config()).merge(botocore.config.Config(**pool_config))
+            if self.retry_config is not None:
+                config = (config or botocore.config.Config()).merge(botocore.config.Config(
+                    retries={'mode': 'standard', 'total_max_attempts': 1},
+                ))
+
+            try:
+                client = self.boto3_session.client(
+                    service,
+                    region_name=region,
+                    endpoint_url=self.endpoint_url,
+                    config=config,
+                )
+            except Exception as e:
+                raise e
+
+            if self.retry_config is not None:
+                retry_handler = self._retry_handlers.get((service, region))
+                if retry_handler is None:
+                    retry_handler = RetryHandler(self.retry_config, self.retry_stats, self._retry_stats_lock)
+                    self._retry_handlers[(service, region)] = retry_handler
+                retry_handler.install(client)
+
+            pool_stats = self.pool_stats.get((service, region))
+            if pool_stats is None:
+                pool_stats = PoolStats()
+                self.pool_stats[(service, region)] = pool_stats
+                self._pool_monitors[(service, region)] = PoolMonitor(pool_stats)
+            pool_stats.max_connections = self._pool_size(service)
+            self._pool_monitors[(service, region)].install(client)
+
+            if self.instrumentation is not None:
+                CallTracer(self.instrumentation, service, region).install(client)
+
+            self._clients[key] = client
+            self.client_cache_stats.builds += 1
 
         return client
 
+    def _pool_size(self, service: str) -> int:
+        if service in self.max_pool_connections:
+            return self.max_pool_connections[service]
+        if self.boto3_config is not None:
+            return self.boto3_config.max_pool_connections
+
+        return DEFAULT_POOL_CONNECTIONS
+
+
+_WARM_UP_CALLS = {
+    's3': ('list_buckets', {}),
+    'sns': ('list_topics', {}),
+    'sqs': ('list_queues', {'MaxResults': 1}),
+}
+
 
 def new_session_for_region(region: str) -> Session:
+    import boto3.session
+
     return new_session_from_config(boto3.session.Config(
         region_name=region,
     ))
 
 
-def new_session_from_config(config: boto3.session.Config, endpoint_url: str = None) -> Session:
+def new_session_from_config(config: boto3.session.Config, endpoint_url: str = None, max_pool_connections: dict = None,
+                            tcp_keepalive: bool = False) -> Session:
+    import boto3.session
+
     session = Session()
     session.boto3_config = config
     session.endpoint_url = endpoint_url
+    session.max_pool_connections = dict(max_pool_connections or {})
+    session.tcp_keepalive = tcp_keepalive
 
     try:
         aws_session = boto3.session.Session(region_name=getattr(config, 'region_name'))
@@ -1,10 +1,17 @@
 import dataclasses
+import threading
+from typing import Iterable
 
 import botocore.exceptions
 
+from .batching import BatchStats, BufferedBatcher, pack_entries, send_batch
 from .session import Session
 from .sqs_queue import SqsQueue
 
+# https://docs.aws.amazon.com/sns/latest/api/API_PublishBatch.html
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+
 
 @dataclasses.dataclass
 class SnsTopic:
@@ -44,7 +51,11 @@ class SnsTopic:
 
         return None
 
-    def publish(self, subject: str, message: str) -> None:
+    def publish(self, subject: str, message: str, message_structure: str = 'json') -> None:
+        optional_args = {}
+        if message_structure != '':
+            optional_args['MessageStructure'] = message_structure
+
         try:
             sns_client = self.session.sns_client()
 
@@ -53,13 +64,59 @@ class SnsTopic:
                 TopicArn=self.topic_arn,
                 Message=message,
                 Subject=subject,
-                MessageStructure='json',
+                **optional_args,
             )
         except Exception as e:
             raise e
 
         return None
 
+    def publish_messages(self, messages: Iterable[str], subject: str = '', message_group_id: str = '',
+                         max_attempts: int = 3, stats: BatchStats = None) -> list:
+        """Publish messages with as few publish_batch calls as the 10 entry and 256 KB batch limits allow.
+
+        message_group_id is required by FIFO topics; use new_publisher() to give each message its own group or
+        deduplication id. Entries that fail for reasons other than the sender's fault are retried, up to
+        max_attempts times in all. Returns the entries still failing, each with the Code and Message of its last
+        failure. Counters are added to stats when given.
+        """
+        stats = stats or BatchStats()
+        stats_lock = threading.Lock()
+        failed = []
+
+        optional_args = {}
+        if subject != '':
+            optional_args['Subject'] = subject
+        if message_group_id != '':
+            optional_args['MessageGroupId'] = message_group_id
+
+        try:
+            entries = (dict(optional_args, Message=message) for message in messages)
+            for batch in pack_entries(entries, _message_size, MAX_BATCH_ENTRIES, MAX_BATCH_BYTES):
+                failed += send_batch(self._publish_batch, batch, _message_size, max_attempts, stats, stats_lock)
+        except Exception as e:
+            raise e
+
+        return failed
+
+    def new_publisher(self, linger: float = 0.05, max_attempts: int = 3) -> BufferedBatcher:
+        """Return a buffered publisher whose add() takes publish_batch entries without an Id, for example
+        {'Message': message, 'MessageGroupId': group, 'MessageDeduplicationId': key}, and publishes them in batches
+        once 10 are buffered, 256 KB is reached or the oldest has waited linger seconds. Its stats give the publish
+        rate and batch fill of this topic. Close it (or use it as a context manager) to publish the rest.
+        """
+        return BufferedBatcher(self._publish_batch, _message_size, MAX_BATCH_ENTRIES, MAX_BATCH_BYTES, linger,
+                               max_attempts)
+
+    def _publish_batch(self, entries: list) -> dict:
+        sns_client = self.session.sns_client()
+
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/sns/client/publish_batch.html
+        return sns_client.publish_batch(
+            TopicArn=self.topic_arn,
+            PublishBatchRequestEntries=entries,
+        )
+
     def subscribe_sqs_queue(self, sqs_queue: SqsQueue) -> str:
         try:
             subscription_arn = self._subscribe('sqs', sqs_queue.queue_arn)
@@ -98,6 +155,15 @@ class SnsTopic:
         return response
 
 
+def _message_size(entry: dict) -> int:
+    size = len(entry['Message'].encode('utf-8')) + len(entry.get('Subject', '').encode('utf-8'))
+    for name, attribute in entry.get('MessageAttributes', {}).items():
+        size += len(name.encode('utf-8')) + len(attribute.get('DataType', '').encode('utf-8'))
+        size += len(attribute.get('StringValue', '').encode('utf-8')) + len(attribute.get('BinaryValue', b''))
+
+    return size
+
+
 def create_sns_topic(aws_session: Session, topic_name: str) -> SnsTopic:
     return new_sns_topic(aws_session, topic_name)
 
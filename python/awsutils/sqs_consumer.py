@@ -0,0 +1,199 @@
+import collections
+import concurrent.futures
+import dataclasses
+import logging
+import threading
+import time
+from typing import Callable
+
+from .batching import BatchStats, BufferedBatcher, pack_entries, send_batch
+from .sqs_queue import MAX_BATCH_BYTES, MAX_BATCH_ENTRIES, SqsQueue, _receipt_handle_size
+
+
+@dataclasses.dataclass
+class ConsumerStats:
+    """ConsumerStats class"""
+    receive_calls: int = 0
+    empty_receives: int = 0
+    receive_errors: int = 0
+    messages_received: int = 0
+    messages_processed: int = 0
+    messages_failed: int = 0
+    visibility_extensions: int = 0
+    started: float = dataclasses.field(default_factory=time.monotonic)
+    latencies: collections.deque = dataclasses.field(default_factory=lambda: collections.deque(maxlen=10000),
+                                                     repr=False)
+
+    def messages_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started
+        if elapsed <= 0:
+            return 0.0
+
+        return self.messages_processed / elapsed
+
+    def latency_percentile(self, percentile: float) -> float:
+        """Handler latency in seconds at percentile (0-100), over the last 10000 messages."""
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return 0.0
+
+        return latencies[min(int(len(latencies) * percentile / 100), len(latencies) - 1)]
+
+
+class SqsConsumer:
+    """SqsConsumer class
+
+    Long polls sqs_queue and calls handler with each received message (the receive_message dict) on a pool of
+    max_workers threads, never holding more messages than there are free workers. Messages whose handler returns
+    are deleted in delete_message_batch calls; messages whose handler raises are left to become visible again.
+    Messages still being handled after half of visibility_timeout have their visibility extended.
+
+    stop() stops polling, which can take up to wait_time_seconds, waits for the handlers in progress and sends the
+    pending deletes.
+    """
+
+    def __init__(self, sqs_queue: SqsQueue, handler: Callable[[dict], None], max_workers: int = 10,
+                 wait_time_seconds: int = 20, visibility_timeout: int = 30, delete_linger: float = 0.5):
+        self.sqs_queue = sqs_queue
+        self.handler = handler
+        self.max_workers = max_workers
+        self.wait_time_seconds = wait_time_seconds
+        self.visibility_timeout = visibility_timeout
+        self.delete_linger = delete_linger
+        self.stats = ConsumerStats()
+        self.deleter = None
+
+        self._stopping = threading.Event()
+        self._stopped = threading.Event()
+        self._slots = threading.Semaphore(max_workers)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._poller = None
+        self._heartbeat = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self) -> None:
+        self.deleter = BufferedBatcher(self.sqs_queue._delete_message_batch, _receipt_handle_size, MAX_BATCH_ENTRIES,
+                                       MAX_BATCH_BYTES, self.delete_linger)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                               thread_name_prefix='awsutils-consumer')
+        self._poller = threading.Thread(target=self._poll, name='awsutils-consumer-poll', daemon=True)
+        self._heartbeat = threading.Thread(target=self._extend_visibility, name='awsutils-consumer-heartbeat',
+                                           daemon=True)
+        self._poller.start()
+        self._heartbeat.start()
+
+        return None
+
+    def stop(self) -> None:
+        """Stop polling, wait for the handlers in flight and delete what they handled. Safe to call when start()
+        was never called or failed partway."""
+        self._stopping.set()
+        if self._poller is not None and self._poller.is_alive():
+            self._poller.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._stopped.set()
+        if self._heartbeat is not None and self._heartbeat.is_alive():
+            self._heartbeat.join()
+        if self.deleter is not None:
+            self.deleter.close()
+
+        return None
+
+    def run(self) -> None:
+        """Consume until stop() is called from another thread or the process is interrupted."""
+        self.start()
+        try:
+            while not self._stopping.wait(1.0):
+                pass
+        finally:
+            self.stop()
+
+        return None
+
+    def _poll(self) -> None:
+        while not self._stopping.is_set():
+            if not self._slots.acquire(timeout=0.1):
+                continue
+            slots = 1
+            while slots < MAX_BATCH_ENTRIES and self._slots.acquire(blocking=False):
+                slots += 1
+
+            try:
+                messages = self.sqs_queue.receive_messages(slots, self.wait_time_seconds, self.visibility_timeout)
+            except Exception:
+                logging.exception('error: SqsConsumer receive_messages failed')
+                messages = []
+                self.stats.receive_errors += 1
+                self._stopping.wait(1.0)
+
+            self.stats.receive_calls += 1
+            if not messages:
+                self.stats.empty_receives += 1
+            self.stats.messages_received += len(messages)
+
+            for _ in range(slots - len(messages)):
+                self._slots.release()
+
+            now = time.monotonic()
+            with self._lock:
+                for message in messages:
+                    self._in_flight[message['ReceiptHandle']] = now
+
+            for message in messages:
+                self._executor.submit(self._handle, message)
+
+    def _handle(self, message: dict) -> None:
+        receipt_handle = message['ReceiptHandle']
+        start = time.monotonic()
+        try:
+            self.handler(message)
+        except Exception:
+            logging.exception(f'error: SqsConsumer handler failed for message {message.get("MessageId")}')
+            with self._lock:
+                self.stats.messages_failed += 1
+        else:
+            self.deleter.add({'ReceiptHandle': receipt_handle})
+            with self._lock:
+                self.stats.messages_processed += 1
+                self.stats.latencies.append(time.monotonic() - start)
+        finally:
+            with self._lock:
+                self._in_flight.pop(receipt_handle, None)
+            self._slots.release()
+
+        return None
+
+    def _extend_visibility(self) -> None:
+        interval = self.visibility_timeout / 4
+        stats_lock = threading.Lock()
+
+        while not self._stopped.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                due = [receipt_handle for receipt_handle, extended in self._in_flight.items()
+                       if now - extended >= self.visibility_timeout / 2]
+            if not due:
+                continue
+
+            entries = ({'ReceiptHandle': receipt_handle, 'VisibilityTimeout': self.visibility_timeout}
+                       for receipt_handle in due)
+            for batch in pack_entries(entries, _receipt_handle_size, MAX_BATCH_ENTRIES, MAX_BATCH_BYTES):
+                failed = send_batch(self.sqs_queue._change_message_visibility_batch, batch, _receipt_handle_size, 1,
+                                    BatchStats(), stats_lock)
+                failed_handles = {entry['ReceiptHandle'] for entry in failed}
+
+                with self._lock:
+                    for entry in batch:
+                        if entry['ReceiptHandle'] in failed_handles or entry['ReceiptHandle'] not in self._in_flight:
+                            continue
+                        self._in_flight[entry['ReceiptHandle']] = now
+                        self.stats.visibility_extensions += 1
@@ -1,9 +1,16 @@
 import dataclasses
+import threading
+from typing import Iterable
 
 import botocore.exceptions
 
+from .batching import BatchStats, BufferedBatcher, pack_entries, send_batch
 from .session import Session
 
+# https://docs.aws.amazon.com/AWSSimpleQueueService/latest/APIReference/API_SendMessageBatch.html
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+
 
 @dataclasses.dataclass
 class SqsQueue:
@@ -69,7 +76,50 @@ class SqsQueue:
         except Exception as e:
             raise e
 
-    def receive_messages(self, max_messages: int) -> list:
+    def send_messages(self, messages: Iterable[str], max_attempts: int = 3, stats: BatchStats = None) -> list:
+        """Send messages with as few send_message_batch calls as the 10 entry and 256 KB batch limits allow.
+
+        Entries that fail for reasons other than the sender's fault are retried, up to max_attempts times in all.
+        Returns the entries still failing, each with the Code and Message of its last failure. Counters are added
+        to stats when given.
+        """
+        stats = stats or BatchStats()
+        stats_lock = threading.Lock()
+        failed = []
+
+        try:
+            entries = ({'MessageBody': message} for message in messages)
+            for batch in pack_entries(entries, _message_size, MAX_BATCH_ENTRIES, MAX_BATCH_BYTES):
+                failed += send_batch(self._send_message_batch, batch, _message_size, max_attempts, stats, stats_lock)
+        except Exception as e:
+            raise e
+
+        return failed
+
+    def new_producer(self, linger: float = 0.05, max_attempts: int = 3) -> BufferedBatcher:
+        """Return a buffered producer whose add() takes send_message_batch entries without an Id, for example
+        {'MessageBody': message}, and sends them in batches once 10 are buffered, 256 KB is reached or the oldest has
+        waited linger seconds. Close it (or use it as a context manager) to send the rest.
+        """
+        return BufferedBatcher(self._send_message_batch, _message_size, MAX_BATCH_ENTRIES, MAX_BATCH_BYTES,
+                               linger, max_attempts)
+
+    def _send_message_batch(self, entries: list) -> dict:
+        sqs_client = self.session.sqs_client()
+
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/sqs/client/send_message_batch.html
+        return sqs_client.send_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=entries,
+        )
+
+    def receive_messages(self, max_messages: int, wait_time_seconds: int = 0, visibility_timeout: int = None) -> list:
+        """Receive up to max_messages messages, long polling for up to wait_time_seconds (at most 20) when the queue is
+        empty. Returns an empty list when no message arrived."""
+        optional_args = {}
+        if visibility_timeout is not None:
+            optional_args['VisibilityTimeout'] = visibility_timeout
+
         try:
             sqs_client = self.session.sqs_client()
 
@@ -79,11 +129,60 @@ class SqsQueue:
                 AttributeNames=['SentTimestamp'],
                 MessageAttributeNames=['All'],
                 MaxNumberOfMessages=max_messages,
+                WaitTimeSeconds=wait_time_seconds,
+                **optional_args,
             )
         except Exception as e:
             raise e
 
-        return response['Messages']
+        return response.get('Messages', [])
+
+    def delete_messages(self, receipt_handles: Iterable[str], max_attempts: int = 3) -> list:
+        """Delete received messages with delete_message_batch calls of up to 10 receipt handles, and return the
+        entries still failing after max_attempts."""
+        stats_lock = threading.Lock()
+        failed = []
+
+        try:
+            entries = ({'ReceiptHandle': receipt_handle} for receipt_handle in receipt_handles)
+            for batch in pack_entries(entries, _receipt_handle_size, MAX_BATCH_ENTRIES, MAX_BATCH_BYTES):
+                failed += send_batch(self._delete_message_batch, batch, _receipt_handle_size, max_attempts,
+                                     BatchStats(), stats_lock)
+        except Exception as e:
+            raise e
+
+        return failed
+
+    def _delete_message_batch(self, entries: list) -> dict:
+        sqs_client = self.session.sqs_client()
+
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/sqs/client/delete_message_batch.html
+        return sqs_client.delete_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=entries,
+        )
+
+    def _change_message_visibility_batch(self, entries: list) -> dict:
+        sqs_client = self.session.sqs_client()
+
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/sqs/client/change_message_visibility_batch.html
+        return sqs_client.change_message_visibility_batch(
+            QueueUrl=self.queue_url,
+            Entries=entries,
+        )
+
+
+def _message_size(entry: dict) -> int:
+    size = len(entry['MessageBody'].encode('utf-8'))
+    for name, attribute in entry.get('MessageAttributes', {}).items():
+        size += len(name.encode('utf-8')) + len(attribute.get('DataType', '').encode('utf-8'))
+        size += len(attribute.get('StringValue', '').encode('utf-8')) + len(attribute.get('BinaryValue', b''))
+
+    return size
+
+
+def _receipt_handle_size(entry: dict) -> int:
+    return len(entry['ReceiptHandle'])
 
 
 def create_sqs_queue(aws_session: Session, queue_name: str) -> SqsQueue:
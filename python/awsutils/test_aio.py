@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from .aio import new_async_s3_object, new_async_session, new_async_sqs_queue
+from .conftest import new_test_aws_session
+from .s3_bucket import create_s3_bucket
+
+
+def test_async_s3_object(setup, request):
+    # a bucket of its own, as other tests list test-bucket
+    s3_bucket = create_s3_bucket(new_test_aws_session(), 'test-async-bucket')
+
+    def finalizer():
+        s3_bucket.empty_and_delete()
+
+    request.addfinalizer(finalizer)
+
+    async def upload_and_download() -> list:
+        async_session = new_async_session(new_test_aws_session(), max_workers=8)
+        async with async_session:
+            s3_objects = await asyncio.gather(*[
+                new_async_s3_object(async_session, s3_bucket.bucket, f'test-async-{i}.txt', lazy=True)
+                for i in range(20)
+            ])
+            await asyncio.gather(*[s3_object.upload_bytes(f'{i}'.encode()) for i, s3_object in enumerate(s3_objects)])
+
+            return await asyncio.gather(*[s3_object.download_bytes() for s3_object in s3_objects])
+
+    try:
+        downloads = asyncio.run(upload_and_download())
+    except Exception as e:
+        pytest.fail(e)
+
+    assert downloads == [f'{i}'.encode() for i in range(20)]
+
+
+def test_async_sqs_queue(setup):
+    aws_session = new_test_aws_session()
+
+    async def send_and_receive() -> list:
+        async with new_async_session(aws_session) as async_session:
+            sqs_queue = await new_async_sqs_queue(async_session, 'test-sqs-queue')
+            await asyncio.gather(*[sqs_queue.send_message(f'test-async-message-{i}') for i in range(5)])
+
+            return await sqs_queue.receive_messages(10, wait_time_seconds=1)
+
+    try:
+        messages = asyncio.run(send_and_receive())
+        sqs_client = aws_session.sqs_client()
+        messages += asyncio.run(send_and_receive())
+    except Exception as e:
+        pytest.fail(e)
+
+    assert len(messages) > 0
+    # the borrowed Session keeps its clients
+    assert aws_session.sqs_client() is sqs_client
@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+# generous, to stay reliable on slow CI machines; importing boto3 alone takes longer
+IMPORT_BUDGET_SECONDS = 0.15
+
+
+def _import_in_new_process(statement: str) -> dict:
+    code = f'''
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'modules': sorted(sys.modules)}}))
+'''
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(__file__)))
+
+    return json.loads(output)
+
+
+def test_import_awsutils():
+    result = _import_in_new_process('import awsutils')
+
+    assert [m for m in result['modules'] if m.startswith('awsutils.')] == []
+    assert 'botocore' not in result['modules']
+
+
+def test_import_sqs_queue():
+    result = _import_in_new_process('from awsutils import SqsQueue, new_sqs_queue')
+
+    assert 'awsutils.sqs_queue' in result['modules']
+    assert 'awsutils.s3_object' not in result['modules']
+    assert 'boto3' not in result['modules']
+    assert 'botocore.client' not in result['modules']
+    assert 'pytz' not in result['modules']
+    assert result['elapsed'] < IMPORT_BUDGET_SECONDS
+
+
+def test_lazy_exports():
+    import awsutils
+
+    assert awsutils.S3Object.__name__ == 'S3Object'
+    assert 'new_s3_object' in dir(awsutils)
+    assert set(awsutils.__all__) <= set(dir(awsutils))
@@ -0,0 +1,40 @@
+import pytest
+
+from .conftest import new_test_aws_session
+from .instrumentation import LatencyHistogram, MetricsAggregator
+from .s3_object import new_s3_object
+
+
+def test_latency_histogram():
+    latency_histogram = LatencyHistogram()
+    for i in range(1, 101):
+        latency_histogram.add(i / 1000)
+
+    assert latency_histogram.count == 100
+    assert latency_histogram.percentile(50) == pytest.approx(0.050, rel=0.05)
+    assert latency_histogram.percentile(99) == pytest.approx(0.099, rel=0.05)
+    assert latency_histogram.percentile(100) == 0.1
+
+
+def test_session_instrumentation(setup):
+    aws_session = new_test_aws_session()
+    # clients cached before instrumentation is set are rebuilt with it
+    s3_client = aws_session.s3_client()
+    aws_session.instrumentation = MetricsAggregator()
+
+    try:
+        s3_object = new_s3_object(aws_session, 'test-bucket', 'test-instrumentation.txt', lazy=True)
+        s3_object.upload_bytes(b'Test')
+        _ = s3_object.download_bytes()
+        _ = new_s3_object(aws_session, 'test-bucket', 'test-missing.txt', lazy=True).exists()
+        # other tests list test-bucket
+        s3_object.delete()
+    except Exception as e:
+        pytest.fail(e)
+
+    rows = {row['operation']: row for row in aws_session.instrumentation.snapshot()}
+    assert aws_session.s3_client() is not s3_client
+    assert rows['PutObject']['bytes_sent'] == 4
+    assert rows['GetObject']['bytes_received'] == 4
+    assert rows['HeadObject']['errors'] == {'404': 1}
+    assert rows['GetObject']['p99'] > 0
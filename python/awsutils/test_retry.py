@@ -0,0 +1,91 @@
+import time
+
+import botocore.awsrequest
+import botocore.exceptions
+import pytest
+
+from .conftest import new_test_aws_session
+from .retry import CircuitBreaker, CircuitOpenError, TokenBucket
+
+
+def test_circuit_breaker():
+    circuit_breaker = CircuitBreaker(failure_threshold=2, cooldown=0.1)
+
+    assert not circuit_breaker.on_failure()
+    assert circuit_breaker.on_failure()
+    assert not circuit_breaker.allow()
+
+    time.sleep(0.1)
+    assert circuit_breaker.allow()
+    assert not circuit_breaker.allow()
+    assert circuit_breaker.state() == 'half-open'
+
+    circuit_breaker.on_success()
+    assert circuit_breaker.state() == 'closed'
+
+
+def test_circuit_breaker_lost_trial():
+    circuit_breaker = CircuitBreaker(failure_threshold=1, cooldown=0.1)
+    circuit_breaker.on_failure()
+
+    time.sleep(0.1)
+    assert circuit_breaker.allow()
+    assert not circuit_breaker.allow()
+
+    # the trial never reported success or failure
+    time.sleep(0.1)
+    assert circuit_breaker.allow()
+    assert circuit_breaker.state() == 'half-open'
+
+    circuit_breaker.on_success()
+    assert circuit_breaker.state() == 'closed'
+
+
+def test_token_bucket():
+    token_bucket = TokenBucket(min_rate=10)
+
+    assert token_bucket.acquire() == 0.0
+    token_bucket.on_throttle()
+    assert token_bucket.rate == 10
+
+    waited = sum(token_bucket.acquire() for _ in range(5))
+    assert waited > 0.3
+
+
+def test_session_retry(setup):
+    aws_session = new_test_aws_session()
+    aws_session.retry_config.failure_threshold = 3
+    s3_client = aws_session.s3_client()
+
+    failures = [('SlowDown', 503), ('InternalError', 500)]
+
+    def fail(request, **kwargs):
+        if not failures:
+            return None
+        code, status_code = failures.pop(0)
+        return botocore.awsrequest.AWSResponse(request.url, status_code, {}, _Raw(
+            f'<Error><Code>{code}</Code><Message>Test</Message></Error>'.encode('utf-8')))
+
+    s3_client.meta.events.register_last('before-send.s3', fail)
+    try:
+        s3_client.head_object(Bucket='test-bucket', Key='test.txt')
+    except Exception as e:
+        pytest.fail(e)
+
+    assert aws_session.retry_stats.retries == 2
+    assert aws_session.retry_stats.throttles == 1
+    assert aws_session.retry_stats.transient_errors == 1
+
+    failures += [('InternalError', 500)] * 3
+    with pytest.raises(botocore.exceptions.ClientError):
+        s3_client.head_object(Bucket='test-bucket', Key='test.txt')
+    with pytest.raises(CircuitOpenError):
+        s3_client.head_object(Bucket='test-bucket', Key='test.txt')
+
+
+class _Raw:
+    def __init__(self, b: bytes):
+        self.b = b
+
+    def stream(self, **kwargs):
+        yield self.b
@@ -3,7 +3,8 @@ import os
 import pytest
 
 from .conftest import new_test_aws_session
-from .s3_bucket import new_s3_bucket, create_s3_bucket, get_bucket_region
+from .s3_bucket import S3Bucket, new_s3_bucket, create_s3_bucket, get_bucket_region
+from .s3_object import new_s3_object
 
 
 def test_new_s3_bucket(setup):
@@ -45,3 +46,173 @@ def test_s3_bucket_s3_url(setup):
         pytest.fail(e)
 
     assert s3_bucket.s3_url() == 's3://test-bucket'
+
+
+def test_s3_bucket_iter_objects(setup):
+    try:
+        aws_session = new_test_aws_session()
+        s3_bucket = new_s3_bucket(aws_session, 'test-bucket')
+        s3_objects = list(s3_bucket.iter_objects(page_size=1))
+    except Exception as e:
+        pytest.fail(e)
+
+    assert [s3_object.object_key for s3_object in s3_objects] == ['test-file.txt', 'test.txt']
+    assert all(s3_object.etag != '' for s3_object in s3_objects)
+
+
+def test_s3_bucket_iter_records(setup):
+    try:
+        aws_session = new_test_aws_session()
+        s3_bucket = new_s3_bucket(aws_session, 'test-bucket')
+        records = list(s3_bucket.iter_records(page_size=1))
+        s3_object_batch = s3_bucket.list_batch()
+    except Exception as e:
+        pytest.fail(e)
+
+    assert [record.object_key for record in records] == ['test-file.txt', 'test.txt']
+    assert list(s3_object_batch) == records
+    assert s3_object_batch.to_s3_object(0, aws_session).etag == records[0].etag
+
+
+def test_s3_bucket_iter_objects_sharded(setup):
+    try:
+        aws_session = new_test_aws_session()
+        s3_bucket = new_s3_bucket(aws_session, 'test-bucket')
+        object_keys = [s3_object.object_key for s3_object in s3_bucket.iter_objects()]
+        ordered_keys = [s3_object.object_key for s3_object in s3_bucket.iter_objects_sharded(ordered=True)]
+        unordered_keys = [s3_object.object_key for s3_object in s3_bucket.iter_objects_sharded(max_concurrency=2)]
+    except Exception as e:
+        pytest.fail(e)
+
+    assert ordered_keys == object_keys
+    assert sorted(unordered_keys) == object_keys
+
+
+def test_s3_bucket_iter_objects_sharded_close(setup):
+    calls = []
+
+    def count_list_objects(**kwargs):
+        calls.append(kwargs)
+
+    try:
+        aws_session = new_test_aws_session()
+        s3_bucket = create_s3_bucket(aws_session, 'test-sharded-s3-bucket')
+        for i in range(40):
+            new_s3_object(aws_session, s3_bucket.bucket, f'test-shard-{i}/test.txt').upload_bytes(b'test')
+
+        s3_client = aws_session.s3_client()
+        s3_client.meta.events.register('before-call.s3.ListObjectsV2', count_list_objects)
+        s3_objects = s3_bucket.iter_objects_sharded(max_concurrency=2)
+        next(s3_objects)
+        s3_objects.close()
+        s3_client.meta.events.unregister('before-call.s3.ListObjectsV2', count_list_objects)
+        errors = s3_bucket.empty_and_delete()
+    except Exception as e:
+        pytest.fail(e)
+
+    assert errors == []
+    # listing all 41 shards makes 42 calls; only the few shards started before close may run
+    assert len(calls) < 20
+
+
+def test_s3_bucket_empty_and_delete(setup):
+    try:
+        aws_session = new_test_aws_session()
+        s3_bucket = create_s3_bucket(aws_session, 'test-empty-and-delete-s3-bucket')
+        for i in range(25):
+            new_s3_object(aws_session, s3_bucket.bucket, f'test-prefix/test-{i}.txt').upload_bytes(b'test')
+
+        prefix_errors = s3_bucket.delete_prefix('test-prefix/test-1')
+        remaining = len(list(s3_bucket.iter_objects()))
+        errors = s3_bucket.empty_and_delete()
+    except Exception as e:
+        pytest.fail(e)
+
+    assert prefix_errors == []
+    assert remaining == 14
+    assert errors == []
+    assert not s3_bucket.exists()
+
+
+def test_s3_bucket_sync(setup, tmp_path):
+    source = tmp_path / 'source'
+    (source / 'test-folder').mkdir(parents=True)
+    (source / 'test.txt').write_bytes(b'test')
+    (source / 'test-folder' / 'test-file.txt').write_bytes(os.urandom(1024))
+
+    try:
+        aws_session = new_test_aws_session()
+        s3_bucket = create_s3_bucket(aws_session, 'test-sync-s3-bucket')
+        upload_report = s3_bucket.sync_from_dir(str(source), 'test-prefix/')
+        repeat_report = s3_bucket.sync_from_dir(str(source), 'test-prefix/')
+        download_report = s3_bucket.sync_to_dir(str(tmp_path / 'target'), 'test-prefix/')
+    except Exception as e:
+        pytest.fail(e)
+
+    assert upload_report.files_transferred == 2
+    assert upload_report.bytes_transferred == 1028
+    assert upload_report.errors == []
+    assert repeat_report.files_skipped == 2
+    assert download_report.files_transferred == 2
+    assert (tmp_path / 'target' / 'test-folder' / 'test-file.txt').read_bytes() == \
+           (source / 'test-folder' / 'test-file.txt').read_bytes()
+
+
+def test_s3_bucket_sync_to_dir_path_traversal(setup, tmp_path):
+    try:
+        aws_session = new_test_aws_session()
+        s3_bucket = create_s3_bucket(aws_session, 'test-sync-traversal-s3-bucket')
+        s3_client = aws_session.s3_client()
+        s3_client.put_object(Bucket=s3_bucket.bucket, Key='test-prefix/../../escaped.txt', Body=b'escaped')
+        s3_client.put_object(Bucket=s3_bucket.bucket, Key='test-prefix/test.txt', Body=b'test')
+
+        report = s3_bucket.sync_to_dir(str(tmp_path / 'a' / 'target'), 'test-prefix/')
+        errors = s3_bucket.empty_and_delete()
+    except Exception as e:
+        pytest.fail(e)
+
+    assert errors == []
+    assert report.files_transferred == 1
+    assert [error['Key'] for error in report.errors] == ['test-prefix/../../escaped.txt']
+    assert report.errors[0]['Code'] == 'InvalidPath'
+    assert not (tmp_path / 'escaped.txt').exists()
+    assert (tmp_path / 'a' / 'target' / 'test.txt').read_bytes() == b'test'
+
+
+def test_s3_bucket_sync_to_dir_failed_download(setup, tmp_path):
+    def fail_get_object(**kwargs):
+        raise IOError('test failure')
+
+    try:
+        aws_session = new_test_aws_session()
+        s3_bucket = create_s3_bucket(aws_session, 'test-sync-failure-s3-bucket')
+        b = os.urandom(1024)
+        new_s3_object(aws_session, s3_bucket.bucket, 'test-prefix/test.bin').upload_bytes(b)
+
+        s3_client = aws_session.s3_client()
+        s3_client.meta.events.register('before-call.s3.GetObject', fail_get_object)
+        failed_report = s3_bucket.sync_to_dir(str(tmp_path / 'target'), 'test-prefix/')
+        s3_client.meta.events.unregister('before-call.s3.GetObject', fail_get_object)
+        retry_report = s3_bucket.sync_to_dir(str(tmp_path / 'target'), 'test-prefix/')
+        errors = s3_bucket.empty_and_delete()
+    except Exception as e:
+        pytest.fail(e)
+
+    assert errors == []
+    assert [error['Key'] for error in failed_report.errors] == ['test-prefix/test.bin']
+    assert retry_report.files_transferred == 1
+    assert retry_report.files_skipped == 0
+    assert (tmp_path / 'target' / 'test.bin').read_bytes() == b
+    assert os.listdir(tmp_path / 'target') == ['test.bin']
+
+
+def test_s3_bucket_delete_objects_error_code(setup):
+    try:
+        aws_session = new_test_aws_session()
+        s3_bucket = S3Bucket(aws_session, bucket='test-missing-s3-bucket')
+        errors = s3_bucket.delete_objects(['test-1.txt', 'test-2.txt'])
+    except Exception as e:
+        pytest.fail(e)
+
+    assert [error['Key'] for error in errors] == ['test-1.txt', 'test-2.txt']
+    assert {error['Code'] for error in errors} == {'NoSuchBucket'}
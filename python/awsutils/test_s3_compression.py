@@ -0,0 +1,67 @@
+import gzip
+
+import pytest
+
+from .s3_compression import (CHUNK_SIZE, GZIP, ZSTD, content_encoding_for, iter_compress, iter_decompress,
+                             iter_in_thread)
+
+B = b'{"id": 1, "status": "ok"}\n' * 100000
+
+
+def test_content_encoding_for():
+    assert content_encoding_for('.gz') == GZIP
+    assert content_encoding_for('.json', 'x-gzip') == GZIP
+    assert content_encoding_for('.gz', 'zstd') == ZSTD
+    assert content_encoding_for('.json') == ''
+
+
+def test_iter_compress_gzip():
+    body = b''.join(iter_compress((B[i:i + 65536] for i in range(0, len(B), 65536)), GZIP))
+    chunks = [(body + body)[i:i + 1000] for i in range(0, 2 * len(body), 1000)]
+
+    assert gzip.decompress(body) == B
+    assert b''.join(iter_decompress(chunks, GZIP)) == B + B
+
+    with pytest.raises(ValueError):
+        list(iter_decompress([body[:-8]], GZIP))
+
+
+def test_iter_compress_zstd():
+    pytest.importorskip('zstandard')
+
+    body = b''.join(iter_in_thread(iter_compress([B], ZSTD)))
+
+    assert len(body) < len(B)
+    assert b''.join(iter_in_thread(iter_decompress([body, body], ZSTD))) == B + B
+
+
+@pytest.mark.parametrize('content_encoding', [GZIP, ZSTD])
+def test_iter_decompress_bounded(content_encoding):
+    if content_encoding == ZSTD:
+        pytest.importorskip('zstandard')
+
+    size = 256 * CHUNK_SIZE
+    body = b''.join(iter_compress(iter([bytes(CHUNK_SIZE)] * 256), content_encoding))
+    sizes = [len(chunk) for chunk in iter_decompress([body], content_encoding)]
+
+    # one chunk expands 1000 times and more
+    assert len(body) < size // 1000
+    assert sum(sizes) == size
+    assert max(sizes) <= CHUNK_SIZE
+
+    with pytest.raises(ValueError):
+        list(iter_decompress([body[:len(body) // 2]], content_encoding))
+    with pytest.raises(ValueError):
+        list(iter_decompress([body[:-1]], content_encoding))
+
+
+def test_iter_in_thread():
+    def fail():
+        yield b'first'
+        raise RuntimeError('failed')
+
+    chunks = iter_in_thread(fail())
+
+    assert next(chunks) == b'first'
+    with pytest.raises(RuntimeError):
+        next(chunks)
@@ -0,0 +1,71 @@
+import json
+
+from .s3_event import S3EventDeduplicator, S3EventRecord, compare_sequencers, parse_s3_event
+from .s3_object import new_s3_objects_from_s3_event
+
+S3_EVENT = json.dumps({
+    'Records': [{
+        'eventVersion': '2.1',
+        'eventSource': 'aws:s3',
+        'awsRegion': 'us-east-2',
+        'eventTime': '2024-05-01T12:00:00.000Z',
+        'eventName': 'ObjectCreated:Put',
+        's3': {
+            'bucket': {'name': 'test-bucket'},
+            'object': {'key': 'test-folder/test+file%281%29.txt', 'size': 4, 'eTag': '0cbc6611f5540bd0809a388dc95a615b',
+                       'sequencer': '0055AED6DCD90281E5'},
+        },
+    }],
+})
+
+
+def test_parse_s3_event():
+    record = S3EventRecord('ObjectCreated:Put', '2024-05-01T12:00:00.000Z', 'us-east-2', 'test-bucket',
+                           'test-folder/test file(1).txt', 4, '"0cbc6611f5540bd0809a388dc95a615b"', '',
+                           '0055AED6DCD90281E5')
+    sns_message = json.dumps({'Type': 'Notification', 'Message': S3_EVENT})
+    sqs_lambda_event = {'Records': [{'eventSource': 'aws:sqs', 'body': sns_message}]}
+
+    assert parse_s3_event(S3_EVENT) == [record]
+    assert parse_s3_event(sns_message.encode('utf-8')) == [record]
+    assert parse_s3_event(sqs_lambda_event) == [record]
+    assert parse_s3_event([{'Body': S3_EVENT}, {'Body': '{"Event": "s3:TestEvent"}'}]) == [record]
+
+
+def test_new_s3_objects_from_s3_event():
+    s3_objects = new_s3_objects_from_s3_event(None, S3_EVENT)
+
+    assert len(s3_objects) == 1
+    assert s3_objects[0].object_key == 'test-folder/test file(1).txt'
+    assert s3_objects[0].region == 'us-east-2'
+    assert s3_objects[0].size == 4
+    assert s3_objects[0].file_type == '.txt'
+    assert s3_objects[0].event_name == 'ObjectCreated:Put'
+
+
+def test_compare_sequencers():
+    assert compare_sequencers('0055AED6DCD90281E5', '0055AED6DCD90281E500') == 0
+    assert compare_sequencers('0055AED6DCD90281E6', '0055AED6DCD90281E5FF') == 1
+    assert compare_sequencers('', '00') == -1
+
+
+def test_s3_event_deduplicator():
+    def new_record(object_key: str, sequencer: str) -> S3EventRecord:
+        return S3EventRecord('ObjectCreated:Put', '', 'us-east-2', 'test-bucket', object_key, 4, '', '', sequencer)
+
+    deduplicator = S3EventDeduplicator()
+    records = deduplicator.add([new_record('test.txt', '02'), new_record('test.txt', '02'),
+                                new_record('test.txt', '01'), new_record('test-file.txt', '01')])
+
+    assert [record.object_key for record in records] == ['test.txt', 'test-file.txt']
+    assert deduplicator.stats.events_duplicate == 1
+    assert deduplicator.stats.events_stale == 1
+
+    deduplicator = S3EventDeduplicator(coalesce_window=60)
+    records = deduplicator.add([new_record('test.txt', '01'), new_record('test.txt', '03'),
+                                new_record('test.txt', '02')])
+
+    assert records == []
+    assert [record.sequencer for record in deduplicator.flush(force=True)] == ['03']
+    assert deduplicator.stats.events_coalesced == 1
+    assert deduplicator.stats.events_dropped() == 2
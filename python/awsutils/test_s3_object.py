@@ -1,6 +1,247 @@
+import gzip
+import io
+import os
+
+import botocore.exceptions
+import pytest
+
+from .conftest import new_test_aws_session
+from .s3_bucket import new_s3_bucket
+from .s3_cache import new_s3_cache
+from .s3_object import new_s3_object, new_s3_object_from_s3_url, new_s3_objects
+from .s3_transfer import MiB, TransferConfig, download_to_file
+
+
 # def test_new_s3_object(setup):
 #     try:
 #         s3_client =
 
 def test_s3_object_s3_url(setup):
     assert True
+
+
+def test_s3_object_upload_download_stream(setup):
+    try:
+        aws_session = new_test_aws_session()
+        config = TransferConfig(part_size=5 * MiB, max_concurrency=4)
+        b = os.urandom(12 * MiB + 1)
+
+        s3_object = new_s3_object(aws_session, 'test-bucket', 'test-stream.bin')
+        s3_object.upload_stream(io.BytesIO(b), config)
+
+        buffer = bytearray(len(b))
+        s3_object.download_stream(buffer, config)
+
+        f = io.BytesIO()
+        s3_object.download_stream(f, config)
+    except Exception as e:
+        pytest.fail(e)
+
+    assert s3_object.size == len(b)
+    assert buffer == b
+    assert f.getvalue() == b
+
+
+def test_s3_object_download_to_file(setup, tmp_path):
+    try:
+        aws_session = new_test_aws_session()
+        config = TransferConfig(part_size=5 * MiB, max_concurrency=4)
+        b = os.urandom(11 * MiB)
+
+        s3_object = new_s3_object(aws_session, 'test-bucket', 'test-download-to-file.bin')
+        s3_object.upload_stream(io.BytesIO(b), config)
+
+        progress = []
+        n = s3_object.download_to_file(str(tmp_path / 'test-download-to-file.bin'), config, progress.append)
+    except Exception as e:
+        pytest.fail(e)
+
+    assert n == len(b)
+    assert sum(progress) == len(b)
+    assert (tmp_path / 'test-download-to-file.bin').read_bytes() == b
+
+
+def test_s3_object_download_to_file_error(setup, tmp_path):
+    aws_session = new_test_aws_session()
+    config = TransferConfig(part_size=5 * MiB, max_concurrency=4)
+    aws_session.s3_client().put_object(Bucket='test-bucket', Key='test-download-error.bin', Body=b'x' * 11 * MiB)
+
+    # a stale etag fails every range, which must surface as is rather than as the BufferError of closing the mmap
+    with pytest.raises(botocore.exceptions.ClientError) as e:
+        download_to_file(aws_session.s3_client(), 'test-bucket', 'test-download-error.bin',
+                         str(tmp_path / 'test-download-error.bin'), config, 11 * MiB, '"stale"')
+    aws_session.s3_client().delete_object(Bucket='test-bucket', Key='test-download-error.bin')
+
+    assert e.value.response['Error']['Code'] == 'PreconditionFailed'
+
+
+def test_new_s3_object_lazy(setup):
+    try:
+        aws_session = new_test_aws_session()
+        s3_object = new_s3_object(aws_session, 'test-bucket', 'test.txt', lazy=True)
+        other = new_s3_object(aws_session, 'test-bucket', 'test.txt', lazy=True)
+        unresolved = (repr(s3_object) == repr(other), 'size=0' in repr(s3_object), s3_object == other,
+                      s3_object._metadata_pending)
+        size = s3_object.size
+    except Exception as e:
+        pytest.fail(e)
+
+    assert unresolved == (True, True, True, True)
+    assert s3_object != other
+    assert size == 4
+    assert s3_object.etag != ''
+    assert aws_session.cached_bucket_region('test-bucket') == s3_object.region
+
+
+def test_s3_object_lazy_head_count(setup):
+    calls = []
+
+    def count_head_object(**kwargs):
+        calls.append(kwargs)
+
+    try:
+        aws_session = new_test_aws_session()
+        aws_session.s3_client().meta.events.register('before-call.s3.HeadObject', count_head_object)
+
+        downloaded = new_s3_object(aws_session, 'test-bucket', 'test.txt', lazy=True)
+        downloaded.download_into(bytearray(4))
+        download_heads = len(calls)
+        _ = downloaded.size
+
+        uploaded = new_s3_object(aws_session, 'test-bucket', 'test-head-count.txt', lazy=True)
+        uploaded.upload_bytes(b'Test')
+        _ = uploaded.size
+        uploaded.delete()
+        aws_session.s3_client().meta.events.unregister('before-call.s3.HeadObject', count_head_object)
+    except Exception as e:
+        pytest.fail(e)
+
+    assert download_heads == 1
+    assert len(calls) == 2
+
+
+def test_new_s3_object_from_s3_url(setup):
+    try:
+        aws_session = new_test_aws_session()
+        s3_object = new_s3_object_from_s3_url(aws_session, 's3://test-bucket/test.txt')
+        lazy_object = new_s3_object_from_s3_url(aws_session, 's3://test-bucket/test.txt', lazy=True)
+    except Exception as e:
+        pytest.fail(e)
+
+    assert (s3_object.bucket, s3_object.object_key, s3_object.size) == ('test-bucket', 'test.txt', 4)
+    assert lazy_object.object_key == 'test.txt'
+
+
+def test_new_s3_objects(setup):
+    try:
+        aws_session = new_test_aws_session()
+        results = new_s3_objects(aws_session, 'test-bucket', ['test.txt', 'test-missing.txt', 'test-file.txt'])
+    except Exception as e:
+        pytest.fail(e)
+
+    assert [s3_object.object_key if s3_object else None for s3_object, _ in results] == \
+        ['test.txt', None, 'test-file.txt']
+    assert [error is None for _, error in results] == [True, False, True]
+
+
+def test_s3_object_copy(setup):
+    try:
+        aws_session = new_test_aws_session()
+        config = TransferConfig(part_size=5 * MiB, copy_threshold=5 * MiB)
+        b = os.urandom(11 * MiB)
+
+        aws_session.s3_client().put_object(Bucket='test-bucket', Key='test-copy-source.bin', Body=b,
+                                           ContentType='application/x-test', CacheControl='no-cache',
+                                           Metadata={'test-key': 'test-value'})
+        s3_object = new_s3_object(aws_session, 'test-bucket', 'test-copy-source.bin')
+
+        target = new_s3_object(aws_session, 'test-bucket', 'test-copy-target.bin', lazy=True)
+        s3_object.copy(target, config=config)
+        target_head = aws_session.s3_client().head_object(Bucket='test-bucket', Key='test-copy-target.bin')
+        small_target = new_s3_object(aws_session, 'test-bucket', 'test-copy-target.txt', lazy=True)
+        new_s3_object(aws_session, 'test-bucket', 'test.txt').copy(small_target)
+    except Exception as e:
+        pytest.fail(e)
+
+    assert target.download_bytes() == b
+    assert target_head['ContentType'] == 'application/x-test'
+    assert target_head['CacheControl'] == 'no-cache'
+    assert target_head['Metadata'] == {'test-key': 'test-value'}
+    assert small_target.download_bytes() == b'Test'
+
+
+def test_s3_object_download_cached(setup, tmp_path):
+    try:
+        aws_session = new_test_aws_session()
+        aws_session.s3_cache = new_s3_cache(str(tmp_path), max_bytes=MiB)
+
+        s3_object = new_s3_object(aws_session, 'test-bucket', 'test-cached.txt', lazy=True)
+        s3_object.upload_bytes(b'Test')
+        first = s3_object.download_bytes()
+        second = bytes(s3_object.download_view())
+        s3_object.upload_bytes(b'Test changed')
+        third = s3_object.download_bytes()
+    except Exception as e:
+        pytest.fail(e)
+
+    assert (first, second, third) == (b'Test', b'Test', b'Test changed')
+    assert aws_session.s3_cache.stats.hits == 1
+    assert aws_session.s3_cache.stats.misses == 2
+    assert aws_session.s3_cache.stats.bytes_saved == 4
+    assert aws_session.s3_cache.size() == 12
+
+
+def test_s3_object_iter_records(setup):
+    try:
+        aws_session = new_test_aws_session()
+        s3_object = new_s3_object(aws_session, 'test-bucket', 'test-records.jsonl', lazy=True)
+        s3_object.upload_bytes(b'{"id": 1, "status": "ok"}\n{"id": 2, "status": "failed"}\n')
+
+        lines = list(s3_object.iter_lines())
+        records = list(s3_object.iter_records(where={'status': 'failed'}, fields=['id']))
+    except Exception as e:
+        pytest.fail(e)
+
+    assert len(lines) == 2
+    assert records == [{'id': 2}]
+
+
+def test_s3_object_upload_download_compressed(setup):
+    try:
+        aws_session = new_test_aws_session()
+        b = b'{"id": 1, "status": "ok"}\n' * 100000
+
+        s3_object = new_s3_object(aws_session, 'test-bucket', 'test-compressed.jsonl', lazy=True)
+        s3_object.upload_stream(io.BytesIO(b), compress=True, content_encoding='gzip', threaded=True)
+
+        f = io.BytesIO()
+        n = s3_object.download_stream(f, decode=True)
+        records = sum(1 for _ in s3_object.iter_records(where={'id': 1}))
+    except Exception as e:
+        pytest.fail(e)
+
+    assert s3_object.content_encoding == 'gzip'
+    assert s3_object.size < len(b)
+    assert n == len(b)
+    assert f.getvalue() == b
+    assert records == 100000
+
+
+def test_s3_object_iter_records_content_encoding(setup):
+    try:
+        aws_session = new_test_aws_session()
+        s3_client = aws_session.s3_client()
+        s3_client.put_object(Bucket='test-bucket', Key='test-encoding/test-records.jsonl',
+                             Body=gzip.compress(b'{"a": 1}\n{"a": 2}\n'), ContentEncoding='gzip')
+
+        eager_object = new_s3_object(aws_session, 'test-bucket', 'test-encoding/test-records.jsonl')
+        lazy_object = new_s3_object(aws_session, 'test-bucket', 'test-encoding/test-records.jsonl', lazy=True)
+        listed_object = next(new_s3_bucket(aws_session, 'test-bucket').iter_objects('test-encoding/'))
+
+        records = [list(s3_object.iter_records()) for s3_object in (eager_object, lazy_object, listed_object)]
+        s3_client.delete_object(Bucket='test-bucket', Key='test-encoding/test-records.jsonl')
+    except Exception as e:
+        pytest.fail(e)
+
+    assert records == [[{'a': 1}, {'a': 2}]] * 3
+    assert lazy_object.content_encoding == 'gzip'
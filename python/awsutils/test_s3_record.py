@@ -0,0 +1,36 @@
+import datetime
+
+from .s3_record import S3ObjectBatch, S3ObjectRecord, new_s3_object_record_from_listing
+
+ENTRIES = [
+    {'Key': 'test-folder/test.txt', 'Size': 4, 'ETag': '"0cbc6611f5540bd0809a388dc95a615b"',
+     'LastModified': datetime.datetime(2024, 5, 1, 12, tzinfo=datetime.timezone.utc), 'StorageClass': 'STANDARD'},
+    {'Key': 'test-folder/tëst-multipart.bin', 'Size': 16 * 1024 * 1024, 'ETag': '"e2fc714c4727ee9395f324cd2e7f331f-2"',
+     'LastModified': datetime.datetime(2024, 5, 2, 12, tzinfo=datetime.timezone.utc), 'StorageClass': 'GLACIER'},
+    {'Key': 'test-folder/other-store.txt', 'Size': 0, 'ETag': 'not-an-md5',
+     'LastModified': datetime.datetime(2024, 5, 3, 12, tzinfo=datetime.timezone.utc), 'StorageClass': 'STANDARD'},
+]
+
+
+def test_new_s3_object_record_from_listing():
+    record = new_s3_object_record_from_listing('test-bucket', ENTRIES[0])
+
+    assert record == S3ObjectRecord('test-bucket', 'test-folder/test.txt', 4, '"0cbc6611f5540bd0809a388dc95a615b"',
+                                    1714564800, 'STANDARD')
+    assert record.last_modified() == ENTRIES[0]['LastModified']
+
+    s3_object = record.to_s3_object(None, 'us-east-2')
+    assert s3_object.object_key == record.object_key
+    assert s3_object.last_modified == ENTRIES[0]['LastModified']
+
+
+def test_s3_object_batch():
+    s3_object_batch = S3ObjectBatch('test-bucket')
+    s3_object_batch.append_entries(ENTRIES)
+
+    records = [new_s3_object_record_from_listing('test-bucket', entry) for entry in ENTRIES]
+    assert len(s3_object_batch) == 3
+    assert list(s3_object_batch) == records
+    assert s3_object_batch[-1] == records[-1]
+    assert list(s3_object_batch.object_keys()) == [entry['Key'] for entry in ENTRIES]
+    assert s3_object_batch.total_size() == 4 + 16 * 1024 * 1024
@@ -0,0 +1,31 @@
+from .s3_select import iter_csv_records, iter_json_lines, iter_lines, matches, select_expression
+
+
+def test_iter_lines():
+    chunks = [b'first\r\nsec', b'', b'ond\n', b'\nthird']
+
+    assert list(iter_lines(chunks)) == [b'first', b'second', b'', b'third']
+    assert list(iter_lines([b'line\n'])) == [b'line']
+
+
+def test_iter_csv_records():
+    chunks = [b'id,name\n1,"multi', b'\nline"\n2,plain', b'\n']
+
+    assert list(iter_csv_records(chunks)) == [{'id': '1', 'name': 'multi\nline'}, {'id': '2', 'name': 'plain'}]
+    assert list(iter_csv_records([b'1;a\n'], header=False, delimiter=';')) == [{'_1': '1', '_2': 'a'}]
+
+
+def test_iter_json_lines():
+    chunks = [b'{"id": 1, "ok": tr', b'ue}\n\n{"id": 2, "ok": false}']
+
+    assert list(iter_json_lines(chunks)) == [{'id': 1, 'ok': True}, {'id': 2, 'ok': False}]
+
+
+def test_select_expression():
+    where = {'status': "it's", 'count': 2, 'ok': True}
+
+    assert select_expression() == 'SELECT * FROM S3Object s'
+    assert select_expression(where, ['id', 'name']) == \
+        'SELECT s."id", s."name" FROM S3Object s WHERE s."status" = \'it\'\'s\' AND s."count" = 2 AND s."ok" = true'
+    assert matches({'status': "it's", 'count': 2, 'ok': True, 'id': 1}, where)
+    assert not matches({'status': "it's", 'count': 2}, where)
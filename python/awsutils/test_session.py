@@ -1,2 +1,43 @@
+import pytest
+
+from .conftest import new_test_aws_session
+
+
 def test_new_session_from_config(setup):
     assert True
+
+
+def test_session_client_cache(setup):
+    aws_session = new_test_aws_session()
+
+    s3_client = aws_session.s3_client()
+    assert aws_session.s3_client() is s3_client
+    assert aws_session.sqs_client() is not s3_client
+    assert aws_session.client_cache_stats.builds == 2
+    assert aws_session.client_cache_stats.hits == 1
+
+    aws_session.invalidate_clients('s3')
+    assert aws_session.s3_client() is not s3_client
+    assert aws_session.client_cache_stats.invalidations == 1
+
+    aws_session.close()
+
+
+def test_session_connection_pool(setup):
+    aws_session = new_test_aws_session()
+    aws_session.tcp_keepalive = True
+    aws_session.reserve_pool_connections(32, ('s3',))
+
+    try:
+        s3_client = aws_session.s3_client()
+        aws_session.warm_up('s3', 4)
+    except Exception as e:
+        pytest.fail(e)
+
+    assert s3_client.meta.config.max_pool_connections == 32
+    assert s3_client.meta.config.tcp_keepalive
+    pool_stats = aws_session.pool_stats[('s3', None)]
+    assert pool_stats.max_connections == 32
+    assert pool_stats.attempts == 4
+    assert pool_stats.peak_in_flight == 4
+    assert pool_stats.saturation() == 0.0
@@ -1,5 +1,6 @@
 import pytest
 
+from .batching import BatchStats
 from .conftest import new_test_aws_session
 from .sns_topic import new_sns_topic, create_sns_topic
 from .sqs_queue import create_sqs_queue
@@ -51,3 +52,22 @@ def test_sns_topic_subscribe(setup):
 
 def test_sns_topic_publish(setup):
     assert True
+
+
+def test_sns_topic_publish_messages(setup):
+    try:
+        aws_session = new_test_aws_session()
+        sns_topic = create_sns_topic(aws_session, 'test-publish-messages-sns-topic')
+        stats = BatchStats()
+        failed = sns_topic.publish_messages([f'test-message-{i}' for i in range(25)], subject='test', stats=stats)
+
+        with sns_topic.new_publisher() as publisher:
+            for i in range(15):
+                publisher.add({'Message': f'test-publisher-message-{i}'})
+    except Exception as e:
+        pytest.fail(e)
+
+    assert failed == []
+    assert stats.entries_sent == 25
+    assert stats.batches_sent == 3
+    assert publisher.stats.entries_sent == 15
@@ -0,0 +1,46 @@
+import threading
+import time
+
+import pytest
+
+from .conftest import new_test_aws_session
+from .sqs_consumer import SqsConsumer
+from .sqs_queue import create_sqs_queue
+
+
+def test_sqs_consumer(setup):
+    received = []
+    lock = threading.Lock()
+
+    def handler(message: dict) -> None:
+        with lock:
+            received.append(message['Body'])
+
+    try:
+        aws_session = new_test_aws_session()
+        sqs_queue = create_sqs_queue(aws_session, 'test-consumer-sqs-queue')
+        sqs_queue.send_messages([f'test-message-{i}' for i in range(20)])
+
+        with SqsConsumer(sqs_queue, handler, max_workers=4, wait_time_seconds=1) as sqs_consumer:
+            deadline = time.monotonic() + 10
+            while len(received) < 20 and time.monotonic() < deadline:
+                time.sleep(0.1)
+    except Exception as e:
+        pytest.fail(e)
+
+    assert sorted(received) == sorted(f'test-message-{i}' for i in range(20))
+    assert sqs_consumer.stats.messages_processed == 20
+    assert sqs_consumer.deleter.stats.entries_sent == 20
+    assert sqs_queue.receive_messages(10) == []
+
+
+def test_sqs_consumer_stop_not_started():
+    sqs_consumer = SqsConsumer(None, lambda message: None)
+    sqs_consumer.stop()
+
+    # fails before any thread is started, as there is no queue to delete from
+    with pytest.raises(AttributeError):
+        sqs_consumer.start()
+    sqs_consumer.stop()
+
+    assert sqs_consumer.deleter is None
@@ -1,5 +1,9 @@
+import threading
+
+import botocore.exceptions
 import pytest
 
+from .batching import BatchStats, send_batch
 from .conftest import new_test_aws_session
 from .sqs_queue import new_sqs_queue, create_sqs_queue
 
@@ -33,3 +37,42 @@ def test_delete_sqs_queue(setup):
         pytest.fail(e)
 
     assert not sqs_queue.exists()
+
+
+def test_sqs_queue_send_messages(setup):
+    try:
+        aws_session = new_test_aws_session()
+        sqs_queue = create_sqs_queue(aws_session, 'test-send-messages-sqs-queue')
+        stats = BatchStats()
+        failed = sqs_queue.send_messages([f'test-message-{i}' for i in range(25)], stats=stats)
+
+        with sqs_queue.new_producer() as producer:
+            for i in range(15):
+                producer.add({'MessageBody': f'test-producer-message-{i}'})
+    except Exception as e:
+        pytest.fail(e)
+
+    assert failed == []
+    assert stats.entries_sent == 25
+    assert stats.batches_sent == 3
+    assert producer.stats.entries_sent == 15
+    assert sqs_queue.message_count() == 40
+
+
+def test_send_batch_client_error():
+    calls = []
+
+    def send(entries: list) -> dict:
+        calls.append(entries)
+        error = {'Error': {'Code': 'AWS.SimpleQueueService.NonExistentQueue', 'Message': 'test'},
+                 'ResponseMetadata': {'HTTPStatusCode': 400}}
+        raise botocore.exceptions.ClientError(error, 'SendMessageBatch')
+
+    stats = BatchStats()
+    failed = send_batch(send, [{'MessageBody': 'test-1'}, {'MessageBody': 'test-2'}], len, 3, stats,
+                        threading.Lock())
+
+    assert len(calls) == 1
+    assert [entry['Code'] for entry in failed] == ['AWS.SimpleQueueService.NonExistentQueue'] * 2
+    assert stats.entries_failed == 2
+    assert stats.entries_retried == 0
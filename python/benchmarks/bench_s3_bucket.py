@@ -0,0 +1,54 @@
+"""Listing throughput of S3Bucket.iter_objects against iter_objects_sharded at several shard concurrencies.
+
+moto answers requests from Python threads in this same process, so absolute numbers are far below S3 and the
+speedup flattens early; compare the relative keys/second between rows.
+"""
+import argparse
+import concurrent.futures
+
+from awsutils.s3_bucket import create_s3_bucket
+
+from .common import Timer, new_bench_session, start_moto_server
+
+
+def populate(aws_session, bucket: str, shards: int, keys_per_shard: int) -> None:
+    s3_client = aws_session.s3_client()
+
+    def put(key: str) -> None:
+        s3_client.put_object(Bucket=bucket, Key=key, Body=b'')
+
+    keys = [f'shard-{i:03}/key-{j:06}' for i in range(shards) for j in range(keys_per_shard)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(put, keys))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', type=int, default=16)
+    parser.add_argument('--keys-per-shard', type=int, default=500)
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    server = start_moto_server()
+    try:
+        aws_session = new_bench_session()
+        s3_bucket = create_s3_bucket(aws_session, 'bench-listing')
+        populate(aws_session, s3_bucket.bucket, args.shards, args.keys_per_shard)
+
+        with Timer() as t:
+            n = sum(1 for _ in s3_bucket.iter_objects(page_size=args.page_size))
+        print(f'{"iter_objects":<28} {n:>8} keys {n / t.elapsed:>10.0f} keys/s')
+
+        for concurrency in (1, 2, 4, 8, 16):
+            for ordered in (False, True):
+                with Timer() as t:
+                    n = sum(1 for _ in s3_bucket.iter_objects_sharded(max_concurrency=concurrency, ordered=ordered,
+                                                                      page_size=args.page_size))
+                name = f'sharded x{concurrency}{" ordered" if ordered else ""}'
+                print(f'{name:<28} {n:>8} keys {n / t.elapsed:>10.0f} keys/s')
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
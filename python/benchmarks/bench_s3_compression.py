@@ -0,0 +1,83 @@
+"""Effective throughput per codec of S3Object.upload_stream with compress and download_stream with decode: MB of
+uncompressed data per second, against moto in a process of its own, for JSON lines data. The zstd codecs need the
+zstandard package and are skipped without it.
+
+    python -m benchmarks.bench_s3_compression --size-mib 64
+"""
+import argparse
+import importlib.util
+import io
+import json
+
+from awsutils.s3_bucket import create_s3_bucket
+from awsutils.s3_object import new_s3_object
+from awsutils.s3_transfer import MiB, TransferConfig
+
+from .common import MotoServerProcess, Timer, new_bench_session
+
+# name: (content_encoding, level)
+CODECS = {
+    'none': ('', None),
+    'gzip-1': ('gzip', 1),
+    'gzip-6': ('gzip', 6),
+    'zstd-1': ('zstd', 1),
+    'zstd-3': ('zstd', 3),
+}
+
+
+def new_body(size: int) -> bytes:
+    """JSON lines of log-like records, about as compressible as real logs."""
+    lines = []
+    n = 0
+    i = 0
+    while n < size:
+        line = json.dumps({'id': i, 'level': 'INFO' if i % 7 else 'WARN', 'service': f'service-{i % 13}',
+                           'latency_ms': (i * 7919) % 1000, 'message': f'request {i * 104729 % 1000003} handled'})
+        lines.append(line)
+        n += len(line) + 1
+        i += 1
+
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mib', type=int, default=64)
+    args = parser.parse_args()
+
+    codecs = {name: codec for name, codec in CODECS.items()
+              if codec[0] != 'zstd' or importlib.util.find_spec('zstandard') is not None}
+    b = new_body(args.size_mib * MiB)
+
+    server = MotoServerProcess()
+    try:
+        aws_session = new_bench_session()
+        config = TransferConfig(part_size=8 * MiB, max_concurrency=8)
+        create_s3_bucket(aws_session, 'bench-compression')
+
+        for name, (content_encoding, level) in codecs.items():
+            for threaded in (False, True):
+                if content_encoding == '' and threaded:
+                    continue
+
+                s3_object = new_s3_object(aws_session, 'bench-compression', f'bench-{name}.jsonl', lazy=True)
+                with Timer() as upload:
+                    s3_object.upload_stream(io.BytesIO(b), config, compress=content_encoding != '',
+                                            content_encoding=content_encoding, level=level, threaded=threaded)
+
+                f = io.BytesIO()
+                with Timer() as download:
+                    n = s3_object.download_stream(f, config, decode=True, threaded=threaded)
+                if n != len(b):
+                    raise RuntimeError(f'{name}: downloaded {n} of {len(b)} bytes')
+
+                label = f'{name}{"[threaded]" if threaded else ""}'
+                print(f'{label:<20} ratio {len(b) / s3_object.size:>6.2f} '
+                      f'upload {len(b) / upload.elapsed / 1e6:>8.1f} MB/s '
+                      f'download {len(b) / download.elapsed / 1e6:>8.1f} MB/s')
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
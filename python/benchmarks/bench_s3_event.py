@@ -0,0 +1,63 @@
+"""Records parsed per second by parse_s3_event and new_s3_objects_from_s3_event, for raw S3 events and for S3 events
+wrapped in an SNS notification delivered through SQS. Needs no server: run python -m benchmarks.bench_s3_event.
+"""
+import argparse
+import json
+
+from awsutils.s3_event import parse_s3_event
+from awsutils.s3_object import new_s3_objects_from_s3_event
+
+from .common import Timer
+
+
+def new_s3_event(records: int) -> str:
+    return json.dumps({'Records': [{
+        'eventVersion': '2.1',
+        'eventSource': 'aws:s3',
+        'awsRegion': 'us-east-2',
+        'eventTime': '2024-05-01T12:00:00.000Z',
+        'eventName': 'ObjectCreated:Put',
+        'userIdentity': {'principalId': 'AWS:AIDAEXAMPLE'},
+        'requestParameters': {'sourceIPAddress': '127.0.0.1'},
+        'responseElements': {'x-amz-request-id': 'C3D13FE58DE4C810', 'x-amz-id-2': 'FMyUVURIY8/IgAtTv8xRjskZQpcIZ9KG'},
+        's3': {
+            's3SchemaVersion': '1.0',
+            'configurationId': 'bench',
+            'bucket': {'name': 'bench-bucket', 'ownerIdentity': {'principalId': 'A3NL1KOZZKExample'},
+                       'arn': 'arn:aws:s3:::bench-bucket'},
+            'object': {'key': f'bench+folder/key-{i:06}.json', 'size': 1024, 'eTag': 'd41d8cd98f00b204e9800998ecf8427e',
+                       'sequencer': f'0055AED6DCD9{i:06X}'},
+        },
+    } for i in range(records)]})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--records-per-message', type=int, default=1)
+    args = parser.parse_args()
+
+    raw = new_s3_event(args.records_per_message)
+    sns = json.dumps({'Type': 'Notification', 'Message': raw})
+    sqs = [{'MessageId': str(i), 'ReceiptHandle': str(i), 'Body': sns} for i in range(10)]
+    records = args.messages * args.records_per_message
+
+    for name, payload in (('raw', raw), ('sns', sns)):
+        with Timer() as t:
+            for _ in range(args.messages):
+                parse_s3_event(payload)
+        print(f'{"parse_s3_event " + name:<40} {records / t.elapsed:>10.0f} records/s')
+
+    with Timer() as t:
+        for _ in range(args.messages // len(sqs)):
+            parse_s3_event(sqs)
+    print(f'{"parse_s3_event sqs batch of sns":<40} {records / t.elapsed:>10.0f} records/s')
+
+    with Timer() as t:
+        for _ in range(args.messages):
+            new_s3_objects_from_s3_event(None, sns)
+    print(f'{"new_s3_objects_from_s3_event sns":<40} {records / t.elapsed:>10.0f} records/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Memory per million listing entries held as S3Objects, S3ObjectRecords and an S3ObjectBatch, measured with
+tracemalloc from synthetic list_objects_v2 entries. Needs no server: run python -m benchmarks.bench_s3_record.
+"""
+import argparse
+import datetime
+import gc
+import hashlib
+import tracemalloc
+from typing import Iterator
+
+from awsutils.s3_object import new_s3_object_from_listing
+from awsutils.s3_record import S3ObjectBatch, new_s3_object_record_from_listing
+
+from .common import Timer
+
+BUCKET = 'bench-bucket'
+
+
+def iter_entries(count: int) -> Iterator[dict]:
+    """Yield list_objects_v2 entries built one at a time, as a listing parses them, so that what a result holds is
+    not shared with a list of entries."""
+    for i in range(count):
+        yield {
+            'Key': f'bench-folder/year=2024/month=05/part-{i:08}.json',
+            'LastModified': datetime.datetime(2024, 5, 1, 12, i % 60, tzinfo=datetime.timezone.utc),
+            'ETag': f'"{hashlib.md5(str(i).encode()).hexdigest()}"',
+            'Size': 1024 + i,
+            'StorageClass': 'STANDARD',
+        }
+
+
+def measure(build, count: int) -> tuple:
+    """Return the bytes still held by the result of build over count entries, and the seconds it took."""
+    gc.collect()
+    tracemalloc.start()
+    with Timer() as t:
+        result = build(iter_entries(count))
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    return held, t.elapsed
+
+
+def build_batch(entries: Iterator[dict]) -> S3ObjectBatch:
+    s3_object_batch = S3ObjectBatch(BUCKET)
+    s3_object_batch.append_entries(entries)
+
+    return s3_object_batch
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, default=200000)
+    args = parser.parse_args()
+
+    builds = {
+        'S3Object': lambda entries: [new_s3_object_from_listing(None, BUCKET, entry, 'us-east-2') for entry in entries],
+        'S3ObjectRecord': lambda entries: [new_s3_object_record_from_listing(BUCKET, entry) for entry in entries],
+        'S3ObjectBatch': build_batch,
+    }
+
+    for name, build in builds.items():
+        held, elapsed = measure(build, args.entries)
+        print(f'{name:<16} {held / args.entries:>8.0f} bytes/entry {held * 1e6 / args.entries / 2 ** 20:>8.0f} '
+              f'MiB/million {args.entries / elapsed:>10.0f} entries/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Records/second, MB/second and peak memory of filtering a JSON lines object: downloading it whole with
+download_bytes, against streaming it with S3Object.iter_records, client-side and through S3 Select.
+
+moto's S3 Select evaluates projections but not WHERE clauses, and is slow, so the S3 Select run is opt-in with
+--select, selects every record and needs a small --size-mib; against S3, use_select transfers only the matching
+records. moto runs in a process of its own, and peak memory is measured with tracemalloc in a separate run, as
+tracing slows Python down.
+
+    python -m benchmarks.bench_s3_select --size-mib 64
+    python -m benchmarks.bench_s3_select --size-mib 1 --select
+"""
+import argparse
+import json
+import tracemalloc
+
+from awsutils.s3_bucket import create_s3_bucket
+from awsutils.s3_object import new_s3_object
+from awsutils.s3_transfer import MiB, TransferConfig
+
+from .common import MotoServerProcess, Timer, new_bench_session
+
+
+def iter_body(size: int):
+    """Yield JSON lines of about 100 bytes until size bytes, one in 100 with status failed."""
+    i = 0
+    n = 0
+    while n < size:
+        line = json.dumps({'id': i, 'status': 'failed' if i % 100 == 0 else 'ok', 'payload': 'x' * 48}).encode()
+        yield line + b'\n'
+        i += 1
+        n += len(line) + 1
+
+
+def filter_downloaded(s3_object) -> int:
+    records = (json.loads(line) for line in s3_object.download_bytes().splitlines() if line.strip())
+
+    return sum(1 for record in records if record['status'] == 'failed')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mib', type=int, default=64)
+    parser.add_argument('--select', action='store_true', help='also run iter_records with use_select')
+    args = parser.parse_args()
+
+    server = MotoServerProcess()
+    try:
+        aws_session = new_bench_session()
+        config = TransferConfig(part_size=5 * MiB, max_concurrency=4)
+        create_s3_bucket(aws_session, 'bench-select')
+        s3_object = new_s3_object(aws_session, 'bench-select', 'bench.jsonl', lazy=True)
+        s3_object.upload_stream(iter_body(args.size_mib * MiB), config)
+
+        runs = {
+            'download_bytes + filter': lambda: filter_downloaded(s3_object),
+            'iter_records': lambda: sum(1 for _ in s3_object.iter_records({'status': 'failed'}, config=config)),
+        }
+        if args.select:
+            runs['iter_records[use_select]'] = lambda: sum(1 for _ in s3_object.iter_records(use_select=True))
+
+        for name, run in runs.items():
+            with Timer() as t:
+                records = run()
+
+            tracemalloc.start()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f'{name:<28} {records:>9} records {s3_object.size / t.elapsed / 1e6:>8.1f} MB/s '
+                  f'peak {peak / MiB:>8.1f} MiB')
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
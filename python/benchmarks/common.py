@@ -0,0 +1,83 @@
+"""Shared setup for the benchmarks, which run against moto's in-process server so they need no AWS account or
+container. Run them from the python directory, e.g. python -m benchmarks.bench_s3_bucket (requires moto[server])."""
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import boto3.session
+
+from awsutils.session import Session, new_session_from_config
+
+MOTO_PORT = 5055
+
+
+def start_moto_server(port: int = MOTO_PORT):
+    # imported here so the awsutils package itself never depends on moto
+    from moto.server import ThreadedMotoServer
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'test')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'test')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server = ThreadedMotoServer(port=port, verbose=False)
+    server.start()
+
+    return server
+
+
+class MotoServerProcess:
+    """MotoServerProcess class
+
+    moto's server in a process of its own, so that tracemalloc and the GIL only see the client.
+    """
+
+    def __init__(self, port: int = MOTO_PORT):
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'test')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'test')
+
+        self.process = subprocess.Popen([sys.executable, '-m', 'moto.server', '-p', str(port)],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError(f'moto server did not start on port {port}')
+                time.sleep(0.1)
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+        return None
+
+
+def new_bench_session(port: int = MOTO_PORT, config: boto3.session.Config = None) -> Session:
+    config = config or boto3.session.Config()
+
+    return new_session_from_config(
+        boto3.session.Config(region_name='us-east-2', s3={'addressing_style': 'path'}).merge(config),
+        endpoint_url=f'http://127.0.0.1:{port}',
+    )
+
+
+class Timer:
+    """Timer class"""
+
+    def __init__(self):
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
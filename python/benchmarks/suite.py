@@ -0,0 +1,160 @@
+"""Ops/second and p50/p99 latency of the awsutils hot paths against moto's in-process server.
+
+    python -m benchmarks.suite --compare benchmarks/baseline.json
+    python -m benchmarks.suite --save benchmarks/baseline.json
+
+--compare exits with status 1 when a benchmark's ops/second fell by more than --tolerance against the baseline.
+Run it before and after a change to a hot path. Absolute numbers depend on the machine, Python and moto recorded in
+the baseline, and compare warns when they differ from the current run. benchmarks/baseline.json was saved on a single
+CPU VM; on another machine, save a baseline of your own from the unchanged tree first and compare against that.
+"""
+import argparse
+import datetime
+import importlib.metadata
+import io
+import os
+import json
+import platform
+import sys
+import time
+from typing import Callable
+
+from awsutils.s3_bucket import create_s3_bucket
+from awsutils.s3_object import new_s3_object
+from awsutils.s3_transfer import MiB
+from awsutils.sns_topic import create_sns_topic
+from awsutils.sqs_queue import create_sqs_queue
+
+from .common import new_bench_session, start_moto_server
+
+KiB = 1024
+SIZES = [('1KiB', KiB), ('1MiB', MiB), ('16MiB', 16 * MiB)]
+
+
+def measure(fn: Callable[[], None], seconds: float, min_iterations: int = 5) -> dict:
+    """Call fn repeatedly for at least seconds and min_iterations, after one warm-up call."""
+    fn()
+
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < min_iterations or time.perf_counter() - start < seconds:
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    return {
+        'iterations': len(latencies),
+        'ops_per_second': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+    }
+
+
+def benchmarks(aws_session) -> dict:
+    """Return the benchmarks by name, after creating what they need."""
+    s3_bucket = create_s3_bucket(aws_session, 'bench-suite')
+    sqs_queue = create_sqs_queue(aws_session, 'bench-suite')
+    sns_topic = create_sns_topic(aws_session, 'bench-suite')
+
+    suite = {}
+    for name, size in SIZES:
+        b = b'x' * size
+        s3_object = new_s3_object(aws_session, s3_bucket.bucket, f'bench-{name}.bin', lazy=True)
+        s3_object.upload_bytes(b)
+
+        suite[f's3_object.upload_bytes[{name}]'] = lambda s3_object=s3_object, b=b: s3_object.upload_bytes(b)
+        suite[f's3_object.upload_stream[{name}]'] = \
+            lambda s3_object=s3_object, b=b: s3_object.upload_stream(io.BytesIO(b))
+        suite[f's3_object.download_bytes[{name}]'] = lambda s3_object=s3_object: s3_object.download_bytes()
+
+    suite['new_s3_object'] = lambda: new_s3_object(aws_session, s3_bucket.bucket, 'bench-1KiB.bin')
+    suite['new_s3_object[lazy]'] = lambda: new_s3_object(aws_session, s3_bucket.bucket, 'bench-1KiB.bin', lazy=True)
+
+    def send_receive() -> None:
+        sqs_queue.send_message('bench')
+        sqs_queue.receive_messages(1)
+
+    suite['sqs_queue.send_message'] = lambda: sqs_queue.send_message('bench')
+    suite['sqs_queue.send_messages[10]'] = lambda: sqs_queue.send_messages(['bench'] * 10)
+    suite['sqs_queue.send_message+receive_messages'] = send_receive
+    suite['sns_topic.publish'] = lambda: sns_topic.publish('bench', json.dumps({'default': 'bench'}))
+
+    return suite
+
+
+def environment() -> dict:
+    """What the numbers of a run depend on besides the code."""
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'moto': importlib.metadata.version('moto'),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print each benchmark against the baseline and return the names that regressed beyond tolerance."""
+    for key, value in environment().items():
+        if baseline.get(key) != value:
+            print(f'warning: baseline {key} is {baseline.get(key)}, this run {value}; ops/second may not compare')
+
+    regressions = []
+    for name, result in results.items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            print(f'{name:<44} {"no baseline":>12}')
+            continue
+
+        ratio = result['ops_per_second'] / base['ops_per_second']
+        regressed = ratio < 1 - tolerance
+        if regressed:
+            regressions.append(name)
+        print(f'{name:<44} {base["ops_per_second"]:>10.1f} -> {result["ops_per_second"]:>10.1f} ops/s '
+              f'{ratio - 1:>+7.1%}{"  REGRESSION" if regressed else ""}')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=2.0, help='minimum run time of each benchmark')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--save', default='', help='write the results as a baseline to this file')
+    parser.add_argument('--compare', default='', help='compare the results to the baseline in this file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed ops/second drop, as a fraction')
+    args = parser.parse_args()
+
+    server = start_moto_server()
+    try:
+        aws_session = new_bench_session()
+        results = {}
+        for name, fn in benchmarks(aws_session).items():
+            if args.filter not in name:
+                continue
+
+            results[name] = measure(fn, args.seconds)
+            print(f'{name:<44} {results[name]["ops_per_second"]:>10.1f} ops/s '
+                  f'p50 {results[name]["p50"] * 1000:>8.2f} ms p99 {results[name]["p99"] * 1000:>8.2f} ms')
+    finally:
+        server.stop()
+
+    if args.save:
+        with open(args.save, mode='w') as f:
+            json.dump({
+                'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                **environment(),
+                'benchmarks': results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()